@@ -0,0 +1,148 @@
+"""Отдача файлов самим приложением без отдельного веб-сервера.
+
+Ответ строится на FileResponse: под gunicorn и другими серверами
+с wsgi.file_wrapper файл уходит через sendfile без копирования
+в Python. Поддерживаются Range (один диапазон), If-Modified-Since,
+If-None-Match и заранее сжатые .br/.gz рядом с файлом.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .middleware import accepted_encodings
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Порядок — по предпочтению: brotli сжимает текст лучше gzip.
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+class RangeFile:
+    """Файл, читаемый не дальше length байт от текущей позиции.
+
+    fileno() отдаётся как есть: sendfile в wsgi.file_wrapper
+    ограничивает длину по Content-Length."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) включительно, None — отдавать весь файл,
+    ValueError — диапазон вне файла.
+
+    Заголовок с ошибкой синтаксиса, в том числе с началом больше
+    конца, по RFC 7233 игнорируется."""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def pick_encoding(request, path):
+    accepted = accepted_encodings(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding in accepted and os.path.isfile(path + suffix):
+            return encoding, path + suffix
+    return None, path
+
+
+def resolve(root, path):
+    try:
+        full_path = safe_join(root, posixpath.normpath(path).lstrip('/'))
+    except SuspiciousFileOperation:
+        raise Http404(path)
+    if not os.path.isfile(full_path):
+        raise Http404(path)
+    return full_path
+
+
+def is_not_modified(request, etag, stat):
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        return request.META['HTTP_IF_NONE_MATCH'] == etag
+    return not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                                  stat.st_mtime, stat.st_size)
+
+
+def file_response(path, size, byte_range, content_type):
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = size
+        return response
+    start, end = byte_range
+    file.seek(start)
+    response = FileResponse(RangeFile(file, end - start + 1), status=206,
+                            content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = end - start + 1
+    return response
+
+
+def serve_file(request, root, path, cache_control=None,
+               precompressed=False):
+    full_path = resolve(root, path)
+    content_type, _ = mimetypes.guess_type(full_path)
+    range_header = request.META.get('HTTP_RANGE')
+    encoding = None
+    if precompressed and not range_header:
+        encoding, full_path = pick_encoding(request, full_path)
+
+    stat = os.stat(full_path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    if is_not_modified(request, etag, stat):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    try:
+        byte_range = parse_range(range_header or '', stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    response = file_response(full_path, stat.st_size, byte_range,
+                             content_type or 'application/octet-stream')
+    if precompressed:
+        response['Vary'] = 'Accept-Encoding'
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['ETag'] = etag
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
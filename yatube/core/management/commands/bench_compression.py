@@ -0,0 +1,99 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.middleware import BrotliStream, GzipStream, brotli
+from posts.models import Follow, Group, Post, User
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 6, 11)
+# Замер чистит кеш, чтобы страницы рендерились заново, поэтому идёт
+# на отдельном LocMemCache: в общем кеше из настроек лежат
+# несброшенные счётчики просмотров и лайков.
+BENCH_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'bench_compression',
+}}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время сжатия и экономию трафика gzip и brotli '
+            'на разных уровнях для страниц основных представлений. '
+            'Все созданные записи откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with override_settings(CACHES=BENCH_CACHES):
+            try:
+                with transaction.atomic():
+                    self.bench(options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def bench(self, options):
+        author = User.objects.create(username='bench_compression_author')
+        reader = User.objects.create(username='bench_compression_reader')
+        group = Group.objects.create(title='Сжатие', slug='bench-compression',
+                                     description='Группа для замеров')
+        Follow.objects.create(user=reader, author=author)
+        Post.objects.bulk_create([
+            Post(author=author, group=group,
+                 text=f'Пост {i} для замера сжатия. ' * 5)
+            for i in range(options['posts'])
+        ], batch_size=500)
+        post = Post.objects.filter(author=author).first()
+        cache.clear()
+
+        pages = {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list', args=[group.slug]),
+            'profile': reverse('posts:profile', args=[author.username]),
+            'post_detail': reverse('posts:post_detail', args=[post.pk]),
+            'follow_index': reverse('posts:follow_index'),
+            'post_create': reverse('posts:post_create'),
+        }
+        client = Client()
+        client.force_login(reader)
+        for view, url in pages.items():
+            response = client.get(url)
+            csrf = bool(response.wsgi_request.META.get('CSRF_COOKIE_USED'))
+            self.stdout.write(
+                f'{view} ({len(response.content)} байт'
+                f'{", CSRF: только gzip с паддингом" if csrf else ""})')
+            for name, factory in self.compressors():
+                size, seconds = self.measure(
+                    factory, response.content, options['repeat'])
+                self.stdout.write(
+                    f'  {name:<12} {size:>8} байт '
+                    f'{size / len(response.content):6.1%} '
+                    f'{seconds * 1000:8.3f} мс')
+
+    def compressors(self):
+        for level in GZIP_LEVELS:
+            yield f'gzip-{level}', lambda level=level: GzipStream(level)
+        if brotli is None:
+            return
+        for quality in BROTLI_QUALITIES:
+            yield (f'br-{quality}',
+                   lambda quality=quality: BrotliStream(quality))
+
+    def measure(self, factory, content, repeat):
+        """Размер сжатого ответа и среднее время сжатия."""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            stream = factory()
+            size = len(stream.compress(content) + stream.finish())
+        return size, (time.perf_counter() - started) / repeat
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import parse_importtime
+
+
+class Command(BaseCommand):
+    help = ('Запускает воркер в отдельном процессе с -X importtime и '
+            'показывает время этапов старта, ready() приложений и '
+            'импорта модулей и пакетов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/',
+                            help='Адрес первого запроса')
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument('--no-admin', action='store_true',
+                            help='Запуск с YATUBE_ADMIN=0')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        if options['no_admin']:
+            env['YATUBE_ADMIN'] = '0'
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-m', 'core.startup',
+             options['path']],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        report = json.loads(result.stdout)
+        modules, packages = parse_importtime(result.stderr.splitlines())
+
+        self.stdout.write(f'Этапы (первый запрос: {report["status"]}):')
+        for name, seconds in report['phases']:
+            self.write_row(name, seconds)
+        self.write_row('всего', sum(s for _, s in report['phases']))
+        self.stdout.write('ready() приложений:')
+        for label, seconds in sorted(report['ready'].items(),
+                                     key=lambda item: -item[1]):
+            self.write_row(label, seconds)
+        self.stdout.write(
+            f'Импорт: {sum(modules.values()) * 1000:.0f} мс, '
+            f'модулей {len(modules)}. Пакеты:')
+        for name, seconds in packages.most_common(options['top']):
+            self.write_row(name, seconds)
+        self.stdout.write('Модули по собственному времени:')
+        for name, seconds in modules.most_common(options['top']):
+            self.write_row(name, seconds)
+
+    def write_row(self, name, seconds):
+        self.stdout.write(f'  {name:<40} {seconds * 1000:8.1f} мс')
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.templating import django_engines, is_cached, warm_templates
+
+
+class Command(BaseCommand):
+    help = ('Компилирует все шаблоны проекта и сообщает об ошибках '
+            'синтаксиса. Веб-процесс делает то же при прогреве.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        compiled, errors = warm_templates()
+        elapsed = (time.perf_counter() - started) * 1000
+        for name, error in errors.items():
+            self.stderr.write(f'{name}: {error}')
+        if not all(is_cached(engine) for engine in django_engines()):
+            self.stdout.write('Cached loader выключен (DEBUG): шаблоны '
+                              'только проверены.')
+        if errors:
+            raise CommandError(f'Ошибок в шаблонах: {len(errors)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Скомпилировано шаблонов: {compiled} за {elapsed:.0f} мс'))
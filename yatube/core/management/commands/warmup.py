@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.warmup import HOT_GROUPS, WARM_PAGES, warmup
+
+
+class Command(BaseCommand):
+    help = ('Проверяет после деплоя базу, URLconf и шаблоны и заполняет '
+            'общий кеш первыми страницами главной и активных сообществ. '
+            'Воркеры прогреваются сами при первом запросе: команда '
+            'не делает их готовыми, а с LocMemCache греет только свой '
+            'процесс.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=WARM_PAGES,
+                            help='Сколько первых страниц каждой ленты')
+        parser.add_argument('--hot-groups', type=int, default=HOT_GROUPS,
+                            help='Сколько самых активных сообществ')
+
+    def handle(self, *args, **options):
+        report = warmup(options['pages'], options['hot_groups'])
+        for name, seconds, result in report:
+            self.stdout.write(f'{name:<12} {result:<28} '
+                              f'{seconds * 1000:8.0f} мс')
+        self.stdout.write(self.style.SUCCESS('Прогрев завершён'))
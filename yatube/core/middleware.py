@@ -0,0 +1,199 @@
+"""Сжатие ответов gzip и brotli, в том числе потоковых.
+
+Сжимаются только текстовые типы из COMPRESSIBLE_TYPES длиннее
+MIN_COMPRESS_SIZE; файлы из core.files не трогаются — для них есть
+заранее сжатые копии и sendfile.
+
+BREACH: если при ответе был выдан CSRF-токен, страница сжимается только
+gzip со случайной строкой переменной длины в поле имени файла заголовка
+(как "Heal the Breach"), чтобы длина ответа не выдавала совпадения.
+Сам токен Django и так маскирует заново для каждого ответа. Для
+потоковых ответов решение принимается до начала отдачи.
+"""
+import re
+import secrets
+import struct
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import profiler
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/plain', 'text/css', 'text/xml', 'text/javascript',
+    'application/javascript', 'application/json', 'application/xml',
+    'application/rss+xml', 'application/atom+xml', 'image/svg+xml',
+)
+MIN_COMPRESS_SIZE = 200
+# Уровни подобраны bench_compression: gzip выше 6 почти не уменьшает
+# страницу, brotli 11 сжимает в десятки раз дольше 5.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+MAX_PADDING = 100
+GZIP_FNAME = 0x08
+ACCEPT_ENCODING_RE = re.compile(
+    r'(?:^|,)\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+SERVER_TIMING_ENTRIES = 8
+
+
+class GzipStream:
+    """gzip по кускам: каждый кусок дописывается с Z_SYNC_FLUSH и сразу
+    уходит клиенту. padding — длина случайного имени файла в
+    заголовке."""
+
+    encoding = 'gzip'
+
+    def __init__(self, level=GZIP_LEVEL, padding=0):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                           -zlib.MAX_WBITS)
+        self.header = gzip_header(padding)
+        self.crc = 0
+        self.size = 0
+
+    def compress(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        chunk = (self.header + self.compressor.compress(data)
+                 + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.header = b''
+        return chunk
+
+    def finish(self):
+        return (self.header + self.compressor.flush()
+                + struct.pack('<LL', self.crc, self.size & 0xffffffff))
+
+
+class BrotliStream:
+    encoding = 'br'
+
+    def __init__(self, quality=BROTLI_QUALITY):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def gzip_header(padding):
+    if not padding:
+        return struct.pack('<BBBBLBB', 0x1f, 0x8b, 8, 0, 0, 0, 255)
+    name = secrets.token_hex(padding)[:padding].encode()
+    return (struct.pack('<BBBBLBB', 0x1f, 0x8b, 8, GZIP_FNAME, 0, 0, 255)
+            + name + b'\0')
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещённых q=0."""
+    accepted = set()
+    for encoding, quality in ACCEPT_ENCODING_RE.findall(header.lower()):
+        try:
+            if quality and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(encoding)
+    return accepted
+
+
+def choose_stream(request):
+    accepted = accepted_encodings(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if request.META.get('CSRF_COOKIE_USED'):
+        if 'gzip' in accepted:
+            return GzipStream(padding=secrets.randbelow(MAX_PADDING) + 1)
+        return None
+    if brotli is not None and 'br' in accepted:
+        return BrotliStream()
+    if 'gzip' in accepted:
+        return GzipStream()
+    return None
+
+
+def is_compressible(response):
+    if (isinstance(response, FileResponse)
+            or response.has_header('Content-Encoding')
+            or response.has_header('Content-Range')):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip()
+    if content_type not in COMPRESSIBLE_TYPES:
+        return False
+    return response.streaming or len(response.content) >= MIN_COMPRESS_SIZE
+
+
+def compress_sequence(stream, sequence):
+    for data in sequence:
+        if data:
+            yield stream.compress(data)
+    yield stream.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает текстовые ответы лучшей из принятых клиентом кодировок."""
+
+    def process_response(self, request, response):
+        if not is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        stream = choose_stream(request)
+        if stream is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                stream, response.streaming_content)
+            del response['Content-Length']
+        else:
+            content = stream.compress(response.content) + stream.finish()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = stream.encoding
+        return response
+
+
+def server_timing(profile):
+    """Server-Timing: общее время рендеринга и самые долгие шаблоны
+    и теги по собственному времени."""
+    entries = [f'render;dur={profile.total() * 1000:.2f}']
+    for index, (name, seconds) in enumerate(
+            profile.templates.most_common(SERVER_TIMING_ENTRIES)):
+        entries.append(f'tpl{index};desc="{name}";dur={seconds * 1000:.2f}')
+    for name, seconds in profile.tags.most_common(SERVER_TIMING_ENTRIES):
+        entries.append(f'tag-{name};dur={seconds * 1000:.2f}')
+    return ', '.join(entries)
+
+
+class RenderProfilerMiddleware:
+    """Замеряет рендеринг шаблонов и отдаёт его в Server-Timing,
+    который видно во вкладке Network браузера. Работает только
+    с RENDER_PROFILER."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'RENDER_PROFILER', False):
+            raise MiddlewareNotUsed
+        profiler.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = profiler.stop(token)
+        if profile.total():
+            response['Server-Timing'] = server_timing(profile)
+        return response
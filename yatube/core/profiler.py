@@ -0,0 +1,83 @@
+"""Профилировщик рендеринга шаблонов.
+
+Пока активен профиль (contextvar), Template._render и
+Node.render_annotated засекают время. Каждому шаблону и тегу
+записывается собственное время — без вложенных шаблонов и тегов,
+поэтому {% include %} и {% cache %} не складывают время своего
+содержимого дважды. Текст и переменные считаются временем шаблона.
+
+Патчи ставит RenderProfilerMiddleware один раз при загрузке, если
+включён RENDER_PROFILER; без активного профиля обёртки сразу вызывают
+исходный метод.
+"""
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.template.base import Node, Template, TokenType
+
+current_profile = ContextVar('render_profile', default=None)
+original_template_render = Template._render
+original_node_render = Node.render_annotated
+
+
+class RenderProfile:
+    def __init__(self):
+        self.templates = Counter()
+        self.tags = Counter()
+        # Время вложенных узлов для каждого открытого уровня.
+        self.nested = [0.0]
+
+    def measure(self, counter, key, render, *args):
+        self.nested.append(0.0)
+        started = time.perf_counter()
+        try:
+            return render(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self.nested.pop()
+            counter[key] += elapsed - nested
+            self.nested[-1] += elapsed
+
+    def total(self):
+        return self.nested[0]
+
+
+def tag_name(node):
+    token = getattr(node, 'token', None)
+    if token is None or token.token_type != TokenType.BLOCK:
+        return None
+    return token.contents.split(None, 1)[0]
+
+
+def profiled_template_render(self, context):
+    profile = current_profile.get()
+    if profile is None:
+        return original_template_render(self, context)
+    name = self.origin.template_name or self.name or '<string>'
+    return profile.measure(profile.templates, name,
+                           original_template_render, self, context)
+
+
+def profiled_node_render(self, context):
+    profile = current_profile.get()
+    name = tag_name(self) if profile is not None else None
+    if name is None:
+        return original_node_render(self, context)
+    return profile.measure(profile.tags, name,
+                           original_node_render, self, context)
+
+
+def install():
+    Template._render = profiled_template_render
+    Node.render_annotated = profiled_node_render
+
+
+def start():
+    return current_profile.set(RenderProfile())
+
+
+def stop(token):
+    profile = current_profile.get()
+    current_profile.reset(token)
+    return profile
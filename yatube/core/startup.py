@@ -0,0 +1,106 @@
+"""Профилирование запуска воркера.
+
+Запускается отдельным процессом с python -X importtime (команда
+profile_startup), чтобы импорты считались с нуля. Процесс проходит
+путь воркера — настройки, apps.populate, WSGI-обработчик и первый
+запрос — и печатает в stdout JSON с длительностью этапов и ready()
+каждого приложения; время импорта модулей интерпретатор пишет в
+stderr.
+"""
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from io import BytesIO
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def timed_ready(timings):
+    """Оборачивает ready() каждого создаваемого AppConfig."""
+    from django.apps import AppConfig
+
+    create = AppConfig.create.__func__
+
+    def timed_create(cls, entry):
+        app_config = create(cls, entry)
+        ready = app_config.ready
+
+        def timed():
+            started = time.perf_counter()
+            ready()
+            timings[app_config.label] = time.perf_counter() - started
+
+        app_config.ready = timed
+        return app_config
+
+    AppConfig.create = classmethod(timed_create)
+
+
+def first_request(application, path):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+    }
+    statuses = []
+    response = application(
+        environ, lambda status, headers: statuses.append(status))
+    b''.join(response)
+    response.close()
+    return statuses[0]
+
+
+def profile(path):
+    phases = []
+    ready = {}
+    started = time.perf_counter()
+
+    def lap(name):
+        nonlocal started
+        now = time.perf_counter()
+        phases.append((name, now - started))
+        started = now
+
+    import django
+    from django.conf import settings
+    settings.INSTALLED_APPS
+    lap('настройки')
+    timed_ready(ready)
+    django.setup()
+    lap('apps.populate')
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+    lap('WSGI-обработчик')
+    status = first_request(application, path)
+    lap('первый запрос')
+    return {'phases': phases, 'ready': ready, 'status': status}
+
+
+def parse_importtime(lines):
+    """Собственное время импорта (в секундах) по модулям и по пакетам
+    верхнего уровня из вывода -X importtime."""
+    modules = Counter()
+    packages = Counter()
+    for line in lines:
+        match = IMPORTTIME_RE.match(line)
+        if match is None:
+            continue
+        seconds = int(match.group(1)) / 10 ** 6
+        module = match.group(4)
+        modules[module] += seconds
+        packages[module.split('.')[0]] += seconds
+    return modules, packages
+
+
+def main():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    json.dump(profile(sys.argv[1] if len(sys.argv) > 1 else '/'),
+              sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Хранилище медиа с именами по содержимому.
+
+Загруженный файл получает имя <каталог>/<ab>/<cd>/<sha256><расширение>,
+где каталог — первая часть исходного пути (например, posts). Одинаковые
+файлы ложатся в одно место и пишутся один раз; миниатюры sorl
+называются по ключу исходника, поэтому тоже не дублируются. Раз имя
+определяется содержимым, файл по нему никогда не меняется и его можно
+кешировать навсегда.
+
+Удалять такие файлы по одной ссылке нельзя: на них могут ссылаться
+другие посты. Осиротевшие файлы убирает команда gc_media.
+"""
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Сжимаются только текстовые форматы: картинки уже сжаты.
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml',
+                '.map', '.ico')
+MIN_COMPRESS_SIZE = 256
+HASHED_NAME_RE = re.compile(
+    r'^(?:[^/]+/)?[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(?:\.\w+)?$')
+
+
+def thumbnail_prefix():
+    return getattr(settings, 'THUMBNAIL_PREFIX', 'cache/')
+
+
+def is_immutable(name):
+    """Имена по содержимому и миниатюры с них не меняют содержимого."""
+    return bool(HASHED_NAME_RE.match(name)) or name.startswith(
+        thumbnail_prefix())
+
+
+class ContentHashStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        hexdigest = digest.hexdigest()
+        top = name.split('/', 1)[0] if '/' in name else ''
+        ext = os.path.splitext(name)[1].lower()
+        return posixpath.join(top, hexdigest[:2], hexdigest[2:4],
+                              hexdigest + ext)
+
+    def get_available_name(self, name, max_length=None):
+        # Имя по содержимому окончательное: тот же путь — тот же файл.
+        if HASHED_NAME_RE.match(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if name.startswith(thumbnail_prefix()):
+            return super()._save(name, content)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        # Пишем во временный файл рядом и атомарно переименовываем:
+        # параллельная загрузка того же файла просто перезапишет его
+        # тем же содержимым.
+        directory, filename = posixpath.split(name)
+        temporary = super()._save(
+            posixpath.join(directory, f'.{uuid.uuid4().hex}-{filename}'),
+            content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешами в именах и заранее сжатыми .gz и .br копиями,
+    которые core.files отдаёт по Accept-Encoding. brotli необязателен:
+    без него пишутся только .gz."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as file:
+                    file.write(compressed)
@@ -0,0 +1,52 @@
+"""Прогрев кеша шаблонов.
+
+С cached loader шаблон разбирается при первом обращении и дальше
+берётся из памяти процесса. warm_templates компилирует все шаблоны
+из DIRS заранее, при прогреве процесса (core.warmup), чтобы первые
+запросы не платили за разбор base.html, header.html, paginator.html
+и прочих включений.
+"""
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt', '.xml')
+
+
+def template_names(directory):
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.endswith(TEMPLATE_EXTENSIONS):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+def django_engines():
+    for backend in engines.all():
+        if isinstance(backend, DjangoTemplates):
+            yield backend.engine
+
+
+def is_cached(engine):
+    return any(isinstance(loader, CachedLoader)
+               for loader in engine.template_loaders)
+
+
+def warm_templates():
+    """Компилирует шаблоны проекта. Возвращает (число шаблонов,
+    ошибки вида {имя: исключение}); без cached loader шаблоны только
+    проверяются."""
+    compiled = 0
+    errors = {}
+    for engine in django_engines():
+        for directory in engine.dirs:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError as error:
+                    errors[name] = error
+                else:
+                    compiled += 1
+    return compiled, errors
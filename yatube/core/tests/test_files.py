@@ -0,0 +1,101 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.http import http_date
+
+from ..files import serve_file
+from ..views import IMMUTABLE_CACHE_CONTROL, static
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = b'0123456789' * 100
+
+
+class ServeFileTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = os.path.join(TEMP_DIR, 'files')
+        os.makedirs(cls.root, exist_ok=True)
+        with open(os.path.join(cls.root, 'data.txt'), 'wb') as file:
+            file.write(CONTENT)
+        with open(os.path.join(cls.root, 'data.txt.gz'), 'wb') as file:
+            file.write(gzip.compress(CONTENT))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def get(self, **headers):
+        request = RequestFactory().get('/', **headers)
+        return serve_file(request, self.root, 'data.txt',
+                          precompressed=True)
+
+    def test_range_requests(self):
+        """Диапазон отдаётся с 206 и Content-Range, вне файла — 416,
+        синтаксически неверный игнорируется."""
+        cases = (
+            ('bytes=10-19', b'0123456789', 'bytes 10-19/1000'),
+            ('bytes=995-', b'56789', 'bytes 995-999/1000'),
+            ('bytes=-3', b'789', 'bytes 997-999/1000'),
+        )
+        for header, body, content_range in cases:
+            with self.subTest(header=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+        self.assertEqual(self.get(HTTP_RANGE='bytes=2000-').status_code, 416)
+        response = self.get(HTTP_RANGE='bytes=20-10')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+
+    def test_precompressed_and_conditional(self):
+        """Сжатая копия выбирается по Accept-Encoding с учётом q=0,
+        повторный запрос с датой изменения получает 304."""
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), CONTENT)
+        refused = self.get(HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        plain = self.get()
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(plain['Accept-Ranges'], 'bytes')
+        not_modified = self.get(
+            HTTP_IF_MODIFIED_SINCE=plain['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=plain['ETag'])
+                         .status_code, 304)
+        self.assertEqual(self.get(
+            HTTP_IF_MODIFIED_SINCE=http_date(0)).status_code, 200)
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """collectstatic пишет имена с хешем и .gz, а static отдаёт их
+        с вечным кешем."""
+        source = os.path.join(TEMP_DIR, 'source')
+        root = os.path.join(TEMP_DIR, 'collected')
+        os.makedirs(source, exist_ok=True)
+        with open(os.path.join(source, 'site.css'), 'w') as file:
+            file.write('body { color: black; }\n' * 50)
+        with override_settings(
+                STATICFILES_DIRS=[source], STATIC_ROOT=root,
+                STATICFILES_STORAGE=('core.storage.'
+                                     'CompressedManifestStaticFilesStorage')):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            hashed = [name for name in os.listdir(root)
+                      if name.startswith('site.') and name.endswith('.css')
+                      and name != 'site.css']
+            self.assertEqual(len(hashed), 1)
+            self.assertTrue(os.path.exists(
+                os.path.join(root, hashed[0] + '.gz')))
+            response = static(RequestFactory().get('/'), hashed[0])
+            self.assertEqual(response['Cache-Control'],
+                             IMMUTABLE_CACHE_CONTROL)
@@ -0,0 +1,88 @@
+import gzip
+from io import StringIO
+from unittest import skipIf
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..middleware import GZIP_FNAME, accepted_encodings, brotli
+
+
+class CompressionMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Тестовый пост {i}')
+            for i in range(20)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_gzip_page(self):
+        """Страница без CSRF-токена сжимается gzip, Vary выставлен."""
+        plain = self.client.get(reverse('posts:index')).content
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']),
+                         len(response.content))
+        self.assertEqual(gzip.decompress(response.content), plain)
+
+    @skipIf(brotli is None, 'brotli не установлен')
+    def test_brotli_preferred(self):
+        """brotli выбирается, если клиент его принимает."""
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Тестовый пост 1',
+                      brotli.decompress(response.content).decode())
+
+    def test_csrf_page_padded_gzip(self):
+        """Страница с CSRF-токеном сжимается только gzip со случайным
+        именем файла в заголовке."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:post_create'),
+                                   HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response.content[3] & GZIP_FNAME)
+        self.assertIn(b'csrfmiddlewaretoken',
+                      gzip.decompress(response.content))
+
+    def test_streaming_response(self):
+        """Потоковый ответ сжимается по кускам без Content-Length."""
+        url = reverse('posts:sitemap_section', args=['posts', 1])
+        plain = b''.join(self.client.get(url).streaming_content)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_not_compressed(self):
+        """Без Accept-Encoding и при q=0 ответ не сжимается."""
+        for header in ('', 'gzip;q=0', 'identity'):
+            with self.subTest(header=header):
+                response = self.client.get(reverse('posts:index'),
+                                           HTTP_ACCEPT_ENCODING=header)
+                self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(accepted_encodings('gzip;q=0.5, br;q=0, deflate'),
+                         {'gzip', 'deflate'})
+
+
+class BenchCompressionCommandTests(TestCase):
+    def test_shared_cache_untouched(self):
+        """Замер чистит только свой кеш, а не общий из настроек."""
+        cache.set('pending_views', 3, None)
+        out = StringIO()
+        call_command('bench_compression', '--posts', '3', '--repeat', '1',
+                     stdout=out)
+        self.assertIn('gzip-6', out.getvalue())
+        self.assertEqual(cache.get('pending_views'), 3)
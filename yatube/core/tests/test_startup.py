@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from ..startup import parse_importtime
+
+IMPORTTIME = [
+    'import time: self [us] | cumulative | imported package',
+    'import time:       500 |        500 |     django.utils',
+    'import time:      1500 |       2000 |   django.urls',
+    'import time:      3000 |       3000 | PIL.Image',
+    'Not Found: /',
+]
+
+
+class StartupProfileTests(SimpleTestCase):
+    def test_parse_importtime(self):
+        """Время импорта суммируется по модулям и пакетам."""
+        modules, packages = parse_importtime(IMPORTTIME)
+        self.assertAlmostEqual(modules['django.urls'], 0.0015)
+        self.assertAlmostEqual(packages['django'], 0.002)
+        self.assertAlmostEqual(packages['PIL'], 0.003)
+        self.assertEqual(len(modules), 3)
+
+    def test_heavy_modules_not_imported_at_startup(self):
+        """Загрузка URLconf не тянет Pillow, django.test и numpy."""
+        code = (
+            'import sys, django; django.setup(); '
+            'from django.urls import get_resolver; '
+            'get_resolver().url_patterns; '
+            "print(sorted({'PIL', 'django.test', 'numpy'} & set(sys.modules)))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='yatube.settings'))
+        self.assertEqual(result.stdout.strip(), '[]')
@@ -0,0 +1,51 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..storage import ContentHashStorage
+from ..views import IMMUTABLE_CACHE_CONTROL, media
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentHashStorageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = ContentHashStorage()
+
+    def test_names_by_content(self):
+        """Одинаковое содержимое получает одно имя, разное — разные."""
+        first = self.storage.save('posts/a.PNG', ContentFile(b'image'))
+        second = self.storage.save('posts/b.png', ContentFile(b'image'))
+        other = self.storage.save('posts/c.png', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/'
+                                r'[0-9a-f]{64}\.png$')
+        _, files = self.storage.listdir(first.rsplit('/', 1)[0])
+        self.assertEqual(files, [first.rsplit('/', 1)[1]])
+
+    def test_thumbnails_keep_their_names(self):
+        """Миниатюры sorl сохраняются под своим именем."""
+        name = self.storage.save('cache/ab/cd/thumb.jpg',
+                                 ContentFile(b'thumb'))
+        self.assertEqual(name, 'cache/ab/cd/thumb.jpg')
+
+    def test_media_view_marks_hashed_files_immutable(self):
+        """Файлы с именем по содержимому отдаются с вечным кешем."""
+        hashed = self.storage.save('posts/a.png', ContentFile(b'image'))
+        plain = 'posts/plain.png'
+        with open(self.storage.path(plain), 'wb') as file:
+            file.write(b'plain')
+        request = RequestFactory().get('/media/')
+        self.assertEqual(media(request, hashed)['Cache-Control'],
+                         IMMUTABLE_CACHE_CONTROL)
+        self.assertFalse(media(request, plain).has_header('Cache-Control'))
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..templating import template_names, warm_templates
+
+CACHED_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [('django.template.loaders.cached.Loader',
+                     settings.TEMPLATE_LOADERS)],
+    },
+}]
+
+
+class WarmTemplatesTests(TestCase):
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_templates_compiled_into_cache(self):
+        """Все шаблоны проекта попадают в cached loader."""
+        names = list(template_names(settings.TEMPLATES_DIR))
+        self.assertIn('includes/paginator.html', names)
+        compiled, errors = warm_templates()
+        self.assertEqual(errors, {})
+        self.assertEqual(compiled, len(names))
+        loader = engines['django'].engine.template_loaders[0]
+        cached = {template.origin.template_name
+                  for template in loader.get_template_cache.values()}
+        self.assertTrue(set(names) <= cached)
+
+
+class RenderProfilerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(RENDER_PROFILER=True)
+    def test_server_timing(self):
+        """Время шаблонов и тегов отдаётся в Server-Timing."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertTrue(timing.startswith('render;dur='))
+        self.assertIn('desc="posts/index.html"', timing)
+        self.assertIn('tag-url;dur=', timing)
+        self.assertIn('tag-cache;dur=', timing)
+
+    @override_settings(RENDER_PROFILER=False)
+    def test_disabled(self):
+        """Без RENDER_PROFILER заголовка нет."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
@@ -0,0 +1,84 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+from ..warmup import (WarmupOnFirstRequest, background_warmup,
+                      hot_group_slugs, warmed_up)
+
+
+class WarmupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(author=cls.user, group=cls.group,
+                            text='Первый пост')
+
+    def setUp(self):
+        cache.clear()
+        warmed_up.clear()
+        self.addCleanup(warmed_up.clear)
+
+    def test_ready_after_warmup(self):
+        """/ready отвечает 503 до прогрева воркера и 200 после него;
+        команда warmup воркер готовым не делает."""
+        response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'status': 'warming up'})
+        out = StringIO()
+        call_command('warmup', stdout=out)
+        self.assertIn('Прогрев завершён', out.getvalue())
+        self.assertFalse(warmed_up.is_set())
+        handler = BaseHandler()
+        handler.load_middleware()
+        # Поток воркера закрывает своё соединение, а здесь оно общее
+        # с транзакцией теста.
+        with mock.patch('django.db.connection.close'):
+            background_warmup(handler, 'testserver')
+        response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ready'})
+
+    def test_warmup_started_once_per_process(self):
+        """Обёртка запускает прогрев при первом запросе в процессе
+        и ещё раз после fork."""
+        application = mock.Mock(return_value=[b''])
+        wrapped = WarmupOnFirstRequest(application)
+        environ = {'HTTP_HOST': 'yatube.example'}
+        with mock.patch('core.warmup.start_background_warmup') as start:
+            wrapped(environ, None)
+            wrapped(environ, None)
+            start.assert_called_once_with(application, 'yatube.example')
+            with mock.patch('os.getpid', return_value=-1):
+                wrapped(environ, None)
+        self.assertEqual(start.call_count, 2)
+        self.assertEqual(application.call_count, 3)
+
+    def test_index_fragment_primed(self):
+        """Прогрев кладёт первую страницу главной в кеш фрагмента,
+        не посылая сигналов начала и конца запроса."""
+        self.assertEqual(hot_group_slugs(5), ['test_slug'])
+        receiver = mock.Mock()
+        request_started.connect(receiver)
+        request_finished.connect(receiver)
+        self.addCleanup(request_started.disconnect, receiver)
+        self.addCleanup(request_finished.disconnect, receiver)
+        call_command('warmup', stdout=StringIO())
+        receiver.assert_not_called()
+        Post.objects.create(author=self.user, text='Новый пост')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Первый пост')
+        self.assertNotContains(response, 'Новый пост')
@@ -1,5 +1,19 @@
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.views import serve as serve_found_static
+from django.db import DatabaseError
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import warmup
+from .files import serve_file
+from .storage import is_immutable
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Имя после ManifestStaticFilesStorage: style.0123456789ab.css.
+MANIFEST_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -11,3 +25,38 @@ def csrf_failure(request, exception=None):
 
 def internal_server_error(request, exception=None):
     return render(request, 'core/500.html', {'path': request.path}, status=500)
+
+
+def ready(request):
+    """Проба готовности для балансировщика: 200 только после прогрева
+    и при доступной базе."""
+    if not warmup.warmed_up.is_set():
+        return JsonResponse({'status': 'warming up'}, status=503)
+    try:
+        warmup.check_database()
+    except DatabaseError:
+        return JsonResponse({'status': 'database unavailable'}, status=503)
+    return JsonResponse({'status': 'ready'})
+
+
+def media(request, path):
+    """Отдаёт медиа; файлы с именами по содержимому кешируются
+    навсегда."""
+    return serve_file(
+        request, settings.MEDIA_ROOT, path,
+        cache_control=IMMUTABLE_CACHE_CONTROL if is_immutable(path)
+        else None,
+    )
+
+
+def static(request, path):
+    """Отдаёт собранную статику с хешами в именах и сжатыми копиями;
+    в DEBUG ищет файлы по исходным каталогам."""
+    if settings.DEBUG:
+        return serve_found_static(request, path, insecure=True)
+    return serve_file(
+        request, settings.STATIC_ROOT, path,
+        cache_control=IMMUTABLE_CACHE_CONTROL
+        if MANIFEST_NAME_RE.search(path) else None,
+        precompressed=True,
+    )
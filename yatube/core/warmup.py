@@ -0,0 +1,159 @@
+"""Прогрев процесса после деплоя.
+
+Первые запросы к свежему воркеру платят за заполнение URL-резолвера,
+разбор шаблонов, промахи кеша фрагмента главной и первые миниатюры.
+warmup проходит эти шаги заранее: проверяет базу, загружает URLconf,
+компилирует шаблоны и запрашивает первые страницы главной и самых
+активных сообществ, заполняя общий кеш.
+
+Кеш шаблонов, резолвер и LocMemCache у каждого процесса свои, поэтому
+прогрев идёт в каждом воркере: wsgi.py оборачивает приложение в
+WarmupOnFirstRequest, и первый запрос к воркеру (обычно проба /ready)
+запускает фоновый поток. Поток, запущенный при импорте, при
+gunicorn --preload остался бы в мастере. /ready отвечает 503, пока
+прогрев не закончится, — балансировщик не шлёт трафик холодному
+воркеру.
+
+Страницы рендерятся через RequestFactory и обработчик самого воркера
+(BaseHandler.get_response) без сигналов request_started/finished:
+тестовый клиент переподключает их приёмники и в многопоточном
+воркере мешает соседним запросам. Команда warmup выполняет те же
+шаги в своём процессе: она заполняет только общий кеш и проверяет
+шаблоны, но не делает готовым ни один воркер.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.db import connection
+from django.urls import get_resolver, reverse
+
+from posts.models import GroupStats
+
+from .templating import warm_templates
+
+HOT_GROUPS = 5
+WARM_PAGES = 1
+
+logger = logging.getLogger(__name__)
+warmed_up = threading.Event()
+
+
+def check_database():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    return 'ok'
+
+
+def load_urls():
+    """Заполняет резолвер корневого URLconf и всех пространств имён."""
+    resolver = get_resolver()
+    patterns = len(resolver.reverse_dict)
+    for _, namespace in resolver.namespace_dict.values():
+        patterns += len(namespace.reverse_dict)
+    return f'{patterns} имён'
+
+
+def compile_templates():
+    compiled, errors = warm_templates()
+    for name, error in errors.items():
+        logger.error('Ошибка в шаблоне %s: %s', name, error)
+    return f'{compiled} шаблонов, ошибок {len(errors)}'
+
+
+def hot_group_slugs(limit):
+    return list(GroupStats.objects.filter(last_post_at__isnull=False)
+                .order_by('-last_post_at')
+                .values_list('group__slug', flat=True)[:limit])
+
+
+def default_host():
+    """Первое конкретное имя из ALLOWED_HOSTS для запросов прогрева."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def warm_pages(pages, hot_groups, handler, host):
+    """Рендерит первые страницы главной и активных сообществ для
+    анонима: рендер заполняет кеш фрагментов и миниатюры."""
+    # RequestFactory тянет django.test; нужна только на время прогрева.
+    from django.test import RequestFactory
+
+    urls = [reverse('posts:index')]
+    urls += [reverse('posts:group_list', args=[slug])
+             for slug in hot_group_slugs(hot_groups)]
+    factory = RequestFactory(HTTP_HOST=host)
+    for url in urls:
+        for page in range(1, pages + 1):
+            handler.get_response(factory.get(url, {'page': page}))
+    return f'{len(urls) * pages} страниц'
+
+
+def warmup(pages=WARM_PAGES, hot_groups=HOT_GROUPS, handler=None,
+           host=None):
+    """Выполняет шаги прогрева. Без handler страницы рендерятся
+    отдельным BaseHandler с middleware из настроек.
+    Возвращает [(шаг, секунды, итог)]."""
+    if handler is None:
+        handler = BaseHandler()
+        handler.load_middleware()
+    host = host or default_host()
+    steps = (
+        ('база данных', check_database),
+        ('маршруты', load_urls),
+        ('шаблоны', compile_templates),
+        ('страницы', lambda: warm_pages(pages, hot_groups, handler, host)),
+    )
+    report = []
+    for name, step in steps:
+        started = time.perf_counter()
+        result = step()
+        report.append((name, time.perf_counter() - started, result))
+    return report
+
+
+def background_warmup(handler, host):
+    """Прогревает процесс воркера и отмечает его готовым."""
+    try:
+        for name, seconds, result in warmup(handler=handler, host=host):
+            logger.info('Прогрев: %s — %s за %.0f мс',
+                        name, result, seconds * 1000)
+    except Exception:
+        # Без прогрева воркер всё равно может работать, просто медленнее
+        # на первых запросах; /ready дальше проверяет базу сам.
+        logger.exception('Прогрев не удался')
+    finally:
+        warmed_up.set()
+        connection.close()
+
+
+def start_background_warmup(handler, host):
+    threading.Thread(target=background_warmup, args=(handler, host),
+                     name='warmup', daemon=True).start()
+
+
+class WarmupOnFirstRequest:
+    """WSGI-обёртка: запускает прогрев при первом запросе в каждом
+    процессе. Сравнение pid отличает воркер от мастера, в котором
+    приложение было импортировано до fork."""
+
+    def __init__(self, application):
+        self.application = application
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    warmed_up.clear()
+                    host = (environ.get('HTTP_HOST')
+                            or environ.get('SERVER_NAME'))
+                    start_background_warmup(self.application, host)
+        return self.application(environ, start_response)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Group, Post, Comment, Follow
+from .models import Group, Post, Comment, Follow, Like, Recommendation
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -21,3 +21,5 @@ admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
 admin.site.register(Comment)
 admin.site.register(Follow)
+admin.site.register(Like)
+admin.site.register(Recommendation)
@@ -0,0 +1,88 @@
+"""Архив постов по датам.
+
+Навигация (годы, месяцы, дни с числом постов) строится по дневным
+корзинам DateBucket/GroupActivity, а не по GROUP BY над постами.
+Сами списки фильтруются полуинтервалом [начало, конец) по pub_date,
+чтобы работали индексы по дате.
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .groupstats import shift_count
+from .models import DateBucket, Post
+
+
+def record_post_day(post, delta):
+    """Учитывает появление (delta=1) или удаление (-1) поста в корзинах
+    сайта и автора."""
+    day = timezone.localdate(post.pub_date)
+    with transaction.atomic():
+        shift_count(DateBucket, delta, scope=DateBucket.SITE, scope_id=0,
+                    day=day)
+        shift_count(DateBucket, delta, scope=DateBucket.AUTHOR,
+                    scope_id=post.author_id, day=day)
+
+
+def rebuild_date_buckets(author_ids=None, post_model=Post,
+                         bucket_model=DateBucket):
+    """Пересчитывает корзины сайта и всех или указанных авторов.
+
+    Миграция передаёт сюда исторические модели."""
+    posts = post_model.objects.order_by().annotate(day=TruncDate('pub_date'))
+    site = posts.values('day').annotate(count=Count('id'))
+    authors = posts.values('author', 'day').annotate(count=Count('id'))
+    author_buckets = bucket_model.objects.filter(scope=DateBucket.AUTHOR)
+    if author_ids is not None:
+        authors = authors.filter(author_id__in=author_ids)
+        author_buckets = author_buckets.filter(scope_id__in=author_ids)
+    with transaction.atomic():
+        bucket_model.objects.filter(scope=DateBucket.SITE).delete()
+        author_buckets.delete()
+        bucket_model.objects.bulk_create(
+            bucket_model(scope=DateBucket.SITE, day=row['day'],
+                         posts_count=row['count'])
+            for row in site.iterator()
+        )
+        bucket_model.objects.bulk_create(
+            bucket_model(scope=DateBucket.AUTHOR, scope_id=row['author'],
+                         day=row['day'], posts_count=row['count'])
+            for row in authors.iterator()
+        )
+
+
+def period(year, month=None, day=None):
+    """Полуинтервал [начало, конец) периода в текущем часовом поясе.
+
+    Несуществующая дата вызывает ValueError."""
+    if day is not None:
+        start = date(year, month, day)
+        end = start + timedelta(days=1)
+    elif month is not None:
+        start = date(year, month, 1)
+        end = start + timedelta(days=calendar.monthrange(year, month)[1])
+    else:
+        start = date(year, 1, 1)
+        end = date(year + 1, 1, 1)
+    return tuple(timezone.make_aware(datetime.combine(value, time.min))
+                 for value in (start, end))
+
+
+def navigation(day_counts, year, month=None):
+    """Счётчики для навигации: все годы, месяцы выбранного года и дни
+    выбранного месяца. day_counts — пары (день, число постов)."""
+    years, months, days = {}, {}, {}
+    for day, count in day_counts:
+        if not count:
+            continue
+        years[day.year] = years.get(day.year, 0) + count
+        if day.year == year:
+            months[day.month] = months.get(day.month, 0) + count
+            if day.month == month:
+                days[day.day] = days.get(day.day, 0) + count
+    return (sorted(years.items(), reverse=True), sorted(months.items()),
+            sorted(days.items()))
@@ -0,0 +1,149 @@
+"""Буферизованные счётчики постов.
+
+Каждый прирост сразу пишется в кеш (incr), а в базу попадает пачкой:
+flush() превращает накопленные приросты в один UPDATE ... CASE на
+FLUSH_BATCH постов. Сброс делает первый запрос после FLUSH_INTERVAL
+секунд или команда flush_post_counters.
+
+Что теряется при сбое. Падение процесса после incr ничего не теряет:
+прирост уже в кеше. Теряется содержимое самого кеша: перезапуск
+memcached/redis или вытеснение ключей унесут всё, что накопилось с
+последнего сброса, то есть не больше FLUSH_INTERVAL секунд счёта.
+LocMemCache живёт внутри процесса, поэтому с ним падение воркера
+теряет те же FLUSH_INTERVAL секунд его собственных просмотров.
+"""
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Post
+
+FLUSH_INTERVAL = 60
+FLUSH_BATCH = 500
+# Защита от двух одновременных сбросов одного счётчика.
+LOCK_TIMEOUT = 5 * 60
+# Если запись журнала потерялась, пост снова попадёт в журнал после
+# истечения метки и его прирост не застрянет в кеше.
+DIRTY_TIMEOUT = 10 * 60
+
+
+class CounterBuffer:
+    """Счётчик поля field модели Post с буфером в кеше.
+
+    Приросты копятся в ключе name:<pk>. Пост, у которого появился
+    несброшенный прирост, один раз записывается в журнал name:log:<n>,
+    поэтому сброс читает только изменившиеся посты.
+    """
+
+    def __init__(self, name, field):
+        self.name = name
+        self.field = field
+
+    def key(self, *parts):
+        return ':'.join((self.name,) + tuple(str(part) for part in parts))
+
+    def incr(self, key, delta):
+        if cache.add(key, delta, None):
+            return delta
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            cache.set(key, delta, None)
+            return delta
+
+    def add(self, pk, delta=1):
+        self.incr(self.key(pk), delta)
+        if cache.add(self.key('dirty', pk), 1, DIRTY_TIMEOUT):
+            seq = self.incr(self.key('seq'), 1)
+            cache.set(self.key('log', seq), pk, None)
+
+    def pending(self, pk):
+        """Прирост, ещё не попавший в базу."""
+        return cache.get(self.key(pk), 0)
+
+    def pending_many(self, pks):
+        values = cache.get_many([self.key(pk) for pk in pks])
+        return {pk: values.get(self.key(pk), 0) for pk in pks}
+
+    def maybe_flush(self):
+        if cache.add(self.key('interval'), 1, FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        """Переносит накопленные приросты в базу, возвращает их сумму."""
+        if not cache.add(self.key('lock'), 1, LOCK_TIMEOUT):
+            return 0
+        try:
+            start = cache.get(self.key('flushed'), 0) + 1
+            end = cache.get(self.key('seq'), 0) + 1
+            retry = cache.get(self.key('retry'))
+            total = 0
+            for first in range(start, end, FLUSH_BATCH):
+                last = min(first + FLUSH_BATCH, end) - 1
+                delta, gap = self.flush_range(first, last, retry)
+                total += delta
+                if gap is not None:
+                    # Номер выдан, но add() ещё не записал строку журнала.
+                    # Следующий сброс продолжит с этого места; если строки
+                    # нет и тогда, она потеряна и пропускается.
+                    cache.set(self.key('retry'), gap, None)
+                    cache.set(self.key('flushed'), gap - 1, None)
+                    break
+                cache.set(self.key('flushed'), last, None)
+            return total
+        finally:
+            cache.delete(self.key('lock'))
+
+    def flush_range(self, first, last, retry=None):
+        """Сбрасывает посты из строк журнала first..last до первой
+        отсутствующей строки (кроме retry — её уже ждали). Возвращает
+        сумму приростов и номер этой строки или None.
+
+        Строки после пропуска не трогаются и достаются следующему
+        сбросу. Приросты берутся из счётчиков, а не из журнала, поэтому
+        повторное чтение тех же постов ничего не задваивает."""
+        log_keys = [self.key('log', seq) for seq in range(first, last + 1)]
+        entries = cache.get_many(log_keys)
+        gap = next((seq for seq, key in enumerate(log_keys, start=first)
+                    if key not in entries and seq != retry), None)
+        if gap is not None:
+            for key in log_keys[gap - first:]:
+                entries.pop(key, None)
+        pks = set(entries.values())
+        # Метка снимается до чтения счётчика: прирост, пришедший после
+        # чтения, заново запишет пост в журнал.
+        cache.delete_many([self.key('dirty', pk) for pk in pks])
+        values = cache.get_many([self.key(pk) for pk in pks])
+        deltas = {pk: values.get(self.key(pk), 0) for pk in pks}
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if deltas:
+            self.apply(deltas)
+            for pk, delta in deltas.items():
+                try:
+                    cache.decr(self.key(pk), delta)
+                except ValueError:
+                    # Счётчик вытеснен после чтения: вычитать не из чего,
+                    # остальные посты пачки всё равно нужно вычесть.
+                    pass
+        cache.delete_many(list(entries))
+        return sum(deltas.values()), gap
+
+    def apply(self, deltas):
+        """Один UPDATE ... SET field = MAX(field + CASE id WHEN ... END, 0).
+
+        Нижняя граница нужна, если в кеше потерялась часть приростов
+        и сумма ушла в минус: иначе UPDATE нарушит CHECK положительного
+        поля и каждый следующий сброс будет падать на той же пачке."""
+        Post.objects.filter(pk__in=deltas).update(**{
+            self.field: Greatest(F(self.field) + Case(
+                *[When(pk=pk, then=Value(delta))
+                  for pk, delta in deltas.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            ), Value(0))
+        })
+
+
+views_counter = CounterBuffer('post_views', 'views_count')
+likes_counter = CounterBuffer('post_likes', 'likes_count')
+COUNTERS = (views_counter, likes_counter)
@@ -0,0 +1,179 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from .models import Group, Post, User
+from .views import LISTING_CACHE_TIMEOUT
+
+FEED_ITEMS = 20
+TITLE_CHARS = 50
+
+
+def absolute(viewname, *args):
+    """Абсолютный адрес от SITE_URL: Feed дописывает домен из Host
+    только к относительным ссылкам."""
+    return settings.SITE_URL + reverse(viewname, args=args)
+
+
+class IndexFeed(Feed):
+    title = 'Yatube — последние обновления'
+    description = 'Последние записи всех авторов'
+    url_name = 'posts:index_rss'
+
+    def feed_url(self, obj):
+        return absolute(self.url_name, *self.url_args(obj))
+
+    def url_args(self, obj):
+        return ()
+
+    def link(self):
+        return absolute('posts:index')
+
+    def items(self):
+        return Post.objects.select_related('author', 'group')[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).chars(TITLE_CHARS)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return absolute('posts:post_detail', item.pk)
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return (item.group.title,) if item.group else ()
+
+
+class GroupFeed(IndexFeed):
+    url_name = 'posts:group_rss'
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube — сообщество {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def url_args(self, obj):
+        return (obj.slug,)
+
+    def link(self, obj):
+        return absolute('posts:group_list', obj.slug)
+
+    def items(self, obj):
+        return obj.posts.select_related('author', 'group')[:FEED_ITEMS]
+
+
+class ProfileFeed(IndexFeed):
+    url_name = 'posts:profile_rss'
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube — записи пользователя {obj.username}'
+
+    def description(self, obj):
+        return f'Последние записи пользователя {obj.username}'
+
+    def url_args(self, obj):
+        return (obj.username,)
+
+    def link(self, obj):
+        return absolute('posts:profile', obj.username)
+
+    def items(self, obj):
+        return Post.objects.filter(author=obj).select_related(
+            'author', 'group')[:FEED_ITEMS]
+
+
+class IndexAtomFeed(IndexFeed):
+    feed_type = Atom1Feed
+    url_name = 'posts:index_atom'
+    subtitle = IndexFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+    url_name = 'posts:group_atom'
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+class ProfileAtomFeed(ProfileFeed):
+    feed_type = Atom1Feed
+    url_name = 'posts:profile_atom'
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+def index_posts():
+    return Post.objects.all()
+
+
+def group_posts(slug):
+    return Post.objects.filter(group__slug=slug)
+
+
+def profile_posts(username):
+    return Post.objects.filter(author__username=username)
+
+
+def feed_state(request, posts, kwargs):
+    """Число постов ленты и время последнего изменения; считается один
+    раз на запрос. Число меняется при удалении, время — при правке."""
+    if not hasattr(request, 'feed_state'):
+        request.feed_state = posts(**kwargs).aggregate(
+            count=Count('id'), latest=Max('updated'))
+    return request.feed_state
+
+
+def feed_view(feed, posts):
+    """Conditional GET отвечает 304 по ETag из числа постов и времени
+    последнего изменения, а готовый XML кешируется под тем же ETag:
+    правка или удаление поста сразу дают новую ленту."""
+    def etag(request, **kwargs):
+        state = feed_state(request, posts, kwargs)
+        latest = state['latest'].timestamp() if state['latest'] else 0
+        return f'{state["count"]}-{latest}'
+
+    def last_modified(request, **kwargs):
+        return feed_state(request, posts, kwargs)['latest']
+
+    @condition(etag_func=etag, last_modified_func=last_modified)
+    def view(request, **kwargs):
+        key = f'feed:{request.path}:{etag(request, **kwargs)}'
+        cached = cache.get(key)
+        if cached is None:
+            response = feed(request, **kwargs)
+            cached = (response.content, response['Content-Type'])
+            cache.set(key, cached, LISTING_CACHE_TIMEOUT)
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+    return view
+
+
+index_rss = feed_view(IndexFeed(), index_posts)
+index_atom = feed_view(IndexAtomFeed(), index_posts)
+group_rss = feed_view(GroupFeed(), group_posts)
+group_atom = feed_view(GroupAtomFeed(), group_posts)
+profile_rss = feed_view(ProfileFeed(), profile_posts)
+profile_atom = feed_view(ProfileAtomFeed(), profile_posts)
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+
+from .idsets import following_authors
+from .models import Follow
+
+FOLLOWERS_CACHE_TIMEOUT = 60 * 60
+FOLLOW_BATCH_SIZE = 1000
+
+
+def followers_key(author_id):
+    return f'followers_count:{author_id}'
+
+
+def followers_count(author_id):
+    """Число подписчиков автора; COUNT выполняется только при промахе."""
+    count = cache.get(followers_key(author_id))
+    if count is None:
+        count = Follow.objects.filter(author_id=author_id).count()
+        cache.set(followers_key(author_id), count, FOLLOWERS_CACHE_TIMEOUT)
+    return count
+
+
+def adjust_followers_count(author_id, delta):
+    try:
+        cache.incr(followers_key(author_id), delta)
+    except ValueError:
+        # Счётчика нет в кеше: он будет посчитан при следующем чтении.
+        pass
+
+
+def bulk_follow(pairs, batch_size=FOLLOW_BATCH_SIZE):
+    """Создаёт подписки по парам (user_id, author_id).
+
+    Уже существующие пары отбрасывает сама база по unique_follower.
+    bulk_create не отправляет post_save, поэтому кеши подписок и
+    счётчики подписчиков затронутых пользователей сбрасываются целиком.
+    """
+    follows = [Follow(user_id=user_id, author_id=author_id)
+               for user_id, author_id in pairs if user_id != author_id]
+    Follow.objects.bulk_create(follows, batch_size=batch_size,
+                               ignore_conflicts=True)
+    for user_id in {follow.user_id for follow in follows}:
+        following_authors.invalidate(user_id)
+    cache.delete_many([followers_key(author_id) for author_id in
+                       {follow.author_id for follow in follows}])
+    return len(follows)
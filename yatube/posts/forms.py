@@ -1,6 +1,8 @@
 from xml.etree.ElementTree import Comment
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from .models import Post, Comment
+from .uploads import prepare_image
 from django.utils.translation import gettext_lazy as _
 
 
@@ -14,6 +16,13 @@ class PostForm(forms.ModelForm):
             'image': _('Добавьте изображение (необязательно).'),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Уже сохранённую картинку при редактировании не трогаем.
+        if isinstance(image, UploadedFile):
+            return prepare_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,97 @@
+"""Сводки по сообществам без GROUP BY по постам на запросе.
+
+GroupStats хранит общее число постов и время последнего, GroupActivity —
+число постов за каждый день. Сигналы постов сдвигают счётчики на ±1,
+rebuild_group_stats пересчитывает их целиком (после импорта или при
+расхождении).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import GroupActivity, GroupStats, Post
+
+ACTIVITY_DAYS = 7
+
+
+def shift_count(model, delta, **lookup):
+    """Сдвигает posts_count строки сводки, создавая её при первом посте."""
+    rows = model.objects.filter(**lookup)
+    if delta < 0:
+        rows = rows.filter(posts_count__gte=-delta)
+    if rows.update(posts_count=F('posts_count') + delta) or delta < 0:
+        return
+    _, created = model.objects.get_or_create(
+        defaults={'posts_count': delta}, **lookup)
+    if not created:
+        model.objects.filter(**lookup).update(
+            posts_count=F('posts_count') + delta)
+
+
+def refresh_last_post(group_id):
+    last_post_at = (Post.objects.filter(group_id=group_id)
+                    .values_list('pub_date', flat=True).first())
+    GroupStats.objects.filter(group_id=group_id).update(
+        last_post_at=last_post_at)
+
+
+def record_post(group_id, pub_date, delta):
+    """Учитывает появление (delta=1) или исчезновение (-1) поста
+    в сообществе."""
+    with transaction.atomic():
+        shift_count(GroupStats, delta, group_id=group_id)
+        shift_count(GroupActivity, delta, group_id=group_id,
+                    day=timezone.localdate(pub_date))
+        if delta > 0:
+            GroupStats.objects.filter(
+                Q(last_post_at__lt=pub_date) | Q(last_post_at=None),
+                group_id=group_id,
+            ).update(last_post_at=pub_date)
+        else:
+            refresh_last_post(group_id)
+
+
+def rebuild_group_stats(group_ids=None, post_model=Post,
+                        stats_model=GroupStats, activity_model=GroupActivity):
+    """Пересчитывает сводки всех или указанных сообществ.
+
+    Миграция передаёт сюда исторические модели."""
+    posts = post_model.objects.filter(group__isnull=False).order_by()
+    stats = stats_model.objects.all()
+    activity = activity_model.objects.all()
+    if group_ids is not None:
+        posts = posts.filter(group_id__in=group_ids)
+        stats = stats.filter(group_id__in=group_ids)
+        activity = activity.filter(group_id__in=group_ids)
+    totals = posts.values('group').annotate(
+        count=Count('id'), last=Max('pub_date'))
+    daily = (posts.annotate(day=TruncDate('pub_date'))
+             .values('group', 'day').annotate(count=Count('id')))
+    with transaction.atomic():
+        stats.delete()
+        activity.delete()
+        stats_model.objects.bulk_create(
+            stats_model(group_id=row['group'], posts_count=row['count'],
+                        last_post_at=row['last'])
+            for row in totals.iterator()
+        )
+        activity_model.objects.bulk_create(
+            activity_model(group_id=row['group'], day=row['day'],
+                           posts_count=row['count'])
+            for row in daily.iterator()
+        )
+
+
+def recent_activity(group_ids, days=ACTIVITY_DAYS):
+    """{group_id: число постов за последние days дней} по сводке."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = (GroupActivity.objects
+            .filter(group_id__in=group_ids, day__gte=since)
+            .order_by().values('group')
+            .annotate(count=Sum('posts_count')))
+    activity = dict.fromkeys(group_ids, 0)
+    activity.update((row['group'], row['count']) for row in rows)
+    return activity
@@ -0,0 +1,97 @@
+from array import array
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+
+from .models import Follow, Like
+
+IDSET_CACHE_TIMEOUT = 60 * 60
+
+
+class IdSet:
+    """Отсортированный массив id: проверка членства бинарным поиском,
+    в кеше хранится как bytes по 8 байт на элемент."""
+
+    def __init__(self, ids=()):
+        self.ids = array('q', sorted(set(ids)))
+
+    @classmethod
+    def from_bytes(cls, data):
+        idset = cls()
+        idset.ids.frombytes(data)
+        return idset
+
+    def to_bytes(self):
+        return self.ids.tobytes()
+
+    def __contains__(self, pk):
+        index = bisect_left(self.ids, pk)
+        return index < len(self.ids) and self.ids[index] == pk
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def add(self, pk):
+        if pk not in self:
+            insort(self.ids, pk)
+
+    def discard(self, pk):
+        index = bisect_left(self.ids, pk)
+        if index < len(self.ids) and self.ids[index] == pk:
+            del self.ids[index]
+
+
+class IdSetCache:
+    """Множество id на пользователя, которое читается из кеша одним get.
+
+    loader(user_id) возвращает id из базы при промахе. Изменения
+    вносятся в уже закешированное множество, а не сбрасывают его.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+
+    def key(self, user_id):
+        return f'{self.name}:{user_id}'
+
+    def get(self, user_id):
+        data = cache.get(self.key(user_id))
+        if data is not None:
+            return IdSet.from_bytes(data)
+        idset = IdSet(self.loader(user_id))
+        cache.set(self.key(user_id), idset.to_bytes(), IDSET_CACHE_TIMEOUT)
+        return idset
+
+    def update(self, user_id, pk, present):
+        data = cache.get(self.key(user_id))
+        if data is None:
+            return
+        idset = IdSet.from_bytes(data)
+        if present:
+            idset.add(pk)
+        else:
+            idset.discard(pk)
+        cache.set(self.key(user_id), idset.to_bytes(), IDSET_CACHE_TIMEOUT)
+
+    def invalidate(self, user_id):
+        cache.delete(self.key(user_id))
+
+
+def _liked_post_ids(user_id):
+    likes = Like.objects.filter(user_id=user_id)
+    return likes.values_list('post_id', flat=True)
+
+
+liked_posts = IdSetCache('liked_posts', _liked_post_ids)
+
+
+def _following_author_ids(user_id):
+    follows = Follow.objects.filter(user_id=user_id)
+    return follows.values_list('author_id', flat=True)
+
+
+following_authors = IdSetCache('following_authors', _following_author_ids)
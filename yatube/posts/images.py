@@ -0,0 +1,153 @@
+"""Варианты картинки поста для srcset, её размеры и заглушка.
+
+При загрузке картинка один раз обрезается под пропорции ленты
+и ужимается до нескольких ширин в JPEG и WebP. Имена файлов и размеры
+сохраняются в Post.image_variants, размеры исходника — в image_width
+и image_height, а крошечная размытая копия (LQIP) — data URI
+в image_placeholder. Шаблону не нужно открывать ни исходник, ни
+варианты.
+"""
+import base64
+import json
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 960)
+# Пропорции кадра ленты, как у прежней миниатюры 960x339.
+ASPECT = (960, 339)
+VARIANTS_DIR = 'posts/variants'
+PLACEHOLDER_WIDTH = 16
+# Порядок важен для <picture>: браузер берёт первый подходящий source.
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 85, 'optimize': True,
+                      'progressive': True}),
+)
+
+
+def open_image(field):
+    # Pillow импортируется при первой обработке, а не при старте
+    # воркера: представления импортируют этот модуль ради одной функции.
+    from PIL import Image, ImageOps
+
+    with field.open('rb') as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def crop_to_aspect(image):
+    """Обрезает картинку по центру под ASPECT."""
+    width, height = image.size
+    target = ASPECT[0] / ASPECT[1]
+    if width / height > target:
+        new_width = max(round(height * target), 1)
+        left = (width - new_width) // 2
+        return image.crop((left, 0, left + new_width, height))
+    new_height = max(round(width / target), 1)
+    top = (height - new_height) // 2
+    return image.crop((0, top, width, top + new_height))
+
+
+def variant_names(variants):
+    return [name for files in variants.values() for _, _, name in files]
+
+
+def placeholder(image):
+    """Размытая копия шириной PLACEHOLDER_WIDTH в виде data URI."""
+    from PIL import Image, ImageFilter
+
+    height = max(round(PLACEHOLDER_WIDTH * image.height / image.width), 1)
+    small = image.resize((PLACEHOLDER_WIDTH, height), Image.BILINEAR)
+    buffer = BytesIO()
+    small.filter(ImageFilter.GaussianBlur(1)).save(buffer, 'JPEG',
+                                                   quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def build_variants(post, image):
+    """Нарезает обрезанную картинку поста и возвращает описание:
+    {формат: [[ширина, высота, имя файла], ...]} по возрастанию ширины.
+
+    Имена файлов назначает хранилище, поэтому берутся из save()."""
+    from PIL import Image
+
+    widths = [width for width in VARIANT_WIDTHS if width <= image.width]
+    widths = widths or [image.width]
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    variants = {}
+    for ext, fmt, options in FORMATS:
+        variants[ext] = []
+        for width in widths:
+            height = max(round(width * image.height / image.width), 1)
+            buffer = BytesIO()
+            image.resize((width, height), Image.LANCZOS).save(
+                buffer, fmt, **options)
+            name = default_storage.save(
+                f'{VARIANTS_DIR}/{post.pk}/{stem}-{width}.{ext}',
+                ContentFile(buffer.getvalue()))
+            variants[ext].append([width, height, name])
+    return variants
+
+
+# Поля, посчитанные по картинке; без картинки или при ошибке — пустые.
+EMPTY_IMAGE_FIELDS = {
+    'image_variants': '',
+    'image_width': None,
+    'image_height': None,
+    'image_placeholder': '',
+}
+
+
+def save_image_fields(post, fields):
+    for name, value in fields.items():
+        setattr(post, name, value)
+    Post.objects.filter(pk=post.pk).update(**fields)
+
+
+def reset_post_image(post):
+    """Сбрасывает варианты, размеры и заглушку прежней картинки, когда
+    её заменили в обход представлений (админка, импорт, ORM).
+    До build_image_variants шаблон покажет обычную миниатюру новой
+    картинки."""
+    save_image_fields(post, EMPTY_IMAGE_FIELDS)
+
+
+def process_post_image(post):
+    """Пересчитывает варианты, размеры и заглушку после загрузки или
+    замены картинки.
+
+    Старые варианты не удаляются: в хранилище по содержимому они могут
+    принадлежать и другим постам, их убирает gc_media. Если картинку
+    не удалось прочитать, поля остаются пустыми и шаблон покажет
+    обычную миниатюру."""
+    fields = dict(EMPTY_IMAGE_FIELDS)
+    if post.image:
+        try:
+            image = open_image(post.image)
+            cropped = crop_to_aspect(image)
+            fields.update(
+                image_variants=json.dumps(build_variants(post, cropped)),
+                image_width=image.width,
+                image_height=image.height,
+                image_placeholder=placeholder(cropped),
+            )
+        except (OSError, ValueError):
+            logger.warning('Не удалось обработать картинку поста %s',
+                           post.pk, exc_info=True)
+    save_image_fields(post, fields)
@@ -0,0 +1,40 @@
+import csv
+import json
+import os
+
+FORMATS = ('jsonl', 'csv')
+
+
+def guess_format(path):
+    """Определяет формат файла по расширению."""
+    ext = os.path.splitext(path)[1].lstrip('.').lower()
+    return 'csv' if ext == 'csv' else 'jsonl'
+
+
+def read_rows(path, fmt, bad_lines=None):
+    """Построчно читает JSONL или CSV, не загружая файл целиком.
+
+    Строки JSONL, которые не разбираются в объект, пропускаются;
+    их номера дописываются в bad_lines."""
+    with open(path, encoding='utf-8', newline='') as source:
+        if fmt == 'csv':
+            yield from csv.DictReader(source)
+            return
+        for number, line in enumerate(source, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if not isinstance(row, dict):
+                if bad_lines is not None:
+                    bad_lines.append(number)
+                continue
+            yield row
+
+
+def report_bad_lines(command, bad_lines):
+    for number in bad_lines:
+        command.stderr.write(f'Строка {number}: некорректный JSON, пропущена')
@@ -0,0 +1,80 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from posts.models import Follow, Post, User
+from posts.timeline import follow_feed
+
+PAGE_SIZE = 10
+# Замер чистит кеш, поэтому идёт на отдельном LocMemCache, а не на
+# общем кеше из настроек: там лежат несброшенные счётчики просмотров
+# и лайков. MAX_ENTRIES больше, чем в настройках, — списки 10 000
+# авторов иначе вытесняются.
+BENCH_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'bench_follow_feed',
+    'OPTIONS': {'MAX_ENTRIES': 10 ** 6},
+}}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает движки ленты подписок join и merge на синтетических '
+            'данных. Все созданные записи откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--follows', type=int, nargs='+',
+                            default=[10, 1000, 10000],
+                            help='Сколько авторов читает пользователь')
+        parser.add_argument('--posts-per-author', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with override_settings(CACHES=BENCH_CACHES):
+            try:
+                with transaction.atomic():
+                    for follows in options['follows']:
+                        self.bench(follows, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def bench(self, follows, options):
+        reader = User.objects.create(username=f'bench_reader_{follows}')
+        User.objects.bulk_create([
+            User(username=f'bench_{follows}_{i}') for i in range(follows)
+        ], batch_size=500)
+        authors = list(User.objects.filter(
+            username__startswith=f'bench_{follows}_'))
+        Follow.objects.bulk_create([
+            Follow(user=reader, author=author) for author in authors
+        ], batch_size=500)
+        Post.objects.bulk_create([
+            Post(author=author, text=f'Пост {i}')
+            for author in authors
+            for i in range(options['posts_per_author'])
+        ], batch_size=500)
+        cache.clear()
+
+        timings = {'join': self.measure(reader, 'join', options['repeat'])}
+        cache.clear()
+        timings['merge (холодный кеш)'] = self.measure(reader, 'merge', 1)
+        timings['merge'] = self.measure(reader, 'merge', options['repeat'])
+        for engine, seconds in timings.items():
+            self.stdout.write(
+                f'{follows:>6} авторов  {engine:<20} {seconds * 1000:9.1f} мс')
+
+    def measure(self, reader, engine, repeat):
+        """Среднее время первой страницы: подсчёт и загрузка постов."""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            feed = follow_feed(reader, engine)
+            feed.count()
+            list(feed[0:PAGE_SIZE])
+        return (time.perf_counter() - started) / repeat
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.images import process_post_image
+from posts.models import Post
+
+CHUNK_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = ('Нарезает варианты картинок и считает размеры и заглушки '
+            'для постов, загруженных до их появления. С --force '
+            'пересобирает все.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Пересобрать и уже нарезанные картинки')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if not options['force']:
+            posts = posts.filter(Q(image_variants='')
+                                 | Q(image_placeholder=''))
+        processed = 0
+        for post in posts.only('pk', 'image', 'image_variants').iterator(
+                chunk_size=CHUNK_SIZE):
+            process_post_image(post)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {processed}'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Recommendation
+from posts.recommendations import BLOCK_SIZE, build_recommendations
+
+PER_USER = 10
+INSERT_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации авторов по подпискам друзей '
+            'и общим комментариям и заменяет ими таблицу рекомендаций.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--per-user', type=int, default=PER_USER,
+                            help='Сколько авторов хранить на пользователя')
+        parser.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                            help='Строк матрицы в одном умножении')
+
+    def handle(self, *args, **options):
+        # Матрицы считаются до транзакции: в SQLite она держит блокировку
+        # записи, и сайт не должен ждать умножений.
+        recommendations = [
+            Recommendation(user_id=user_id, author_id=author_id, score=score)
+            for user_id, author_id, score in build_recommendations(
+                options['per_user'], options['block_size'])
+        ]
+        with transaction.atomic():
+            Recommendation.objects.all().delete()
+            Recommendation.objects.bulk_create(
+                recommendations, batch_size=INSERT_BATCH_SIZE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено рекомендаций: {len(recommendations)}'))
@@ -0,0 +1,101 @@
+import heapq
+import os
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post, RelatedPost
+from posts.related import BLOCK_SIZE, TfidfIndex
+from posts.utils import batched
+
+PER_POST = 5
+INSERT_BATCH_SIZE = 1000
+DELETE_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = ('Строит TF-IDF векторы текстов постов и сохраняет для каждого '
+            'поста самые похожие. С --incremental векторизуются только '
+            'новые и изменённые посты; списки остальных пересчитываются, '
+            'если в них могли быть изменённые или удалённые посты, '
+            'и дополняются новыми похожими.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Пересчитать только новые и изменённые '
+                                 'посты по сохранённому индексу')
+        parser.add_argument('--per-post', type=int, default=PER_POST,
+                            help='Сколько похожих постов хранить')
+        parser.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                            help='Строк матрицы в одном умножении')
+
+    def handle(self, *args, **options):
+        path = settings.RELATED_POSTS_INDEX
+        posts = list(Post.objects.order_by('id')
+                     .values_list('id', 'text').iterator())
+        ids = [post_id for post_id, _ in posts]
+        texts = [text for _, text in posts]
+        incremental = options['incremental'] and os.path.exists(path)
+        merged = []
+        if incremental:
+            index = TfidfIndex.load(path)
+            changed, stale = index.update(ids, texts)
+            # Изменённые и удалённые посты могли стоять в чужих списках
+            # со старым сходством: такие списки считаются целиком.
+            recompute = np.union1d(changed, np.array(
+                sorted(index.touched_by(stale, options['block_size'])),
+                dtype=np.int64))
+            merged = self.merge_candidates(
+                index, changed, set(recompute.tolist()), options)
+        else:
+            index = TfidfIndex.fit(ids, texts)
+            recompute = index.ids
+
+        # Блочные умножения идут до транзакции: в SQLite она держит
+        # блокировку записи.
+        relations = [
+            RelatedPost(post_id=post_id, related_id=related_id, score=score)
+            for post_id, related_id, score in chain(
+                index.neighbours(recompute, options['per_post'],
+                                 options['block_size']), merged)
+        ]
+        rewritten = recompute.tolist() + sorted(
+            {post_id for post_id, _, _ in merged})
+        with transaction.atomic():
+            if incremental:
+                for chunk in batched(rewritten, DELETE_BATCH_SIZE):
+                    RelatedPost.objects.filter(post_id__in=chunk).delete()
+            else:
+                RelatedPost.objects.all().delete()
+            RelatedPost.objects.bulk_create(
+                relations, batch_size=INSERT_BATCH_SIZE)
+        index.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано постов: {len(recompute)}, '
+            f'дополнено списков: {len(rewritten) - len(recompute)}, '
+            f'сохранено связей: {len(relations)}'))
+
+    def merge_candidates(self, index, changed, recompute, options):
+        """Строки для остальных постов, которым новые и изменённые
+        посты подходят в похожие: top-k из сохранённого списка
+        и новых кандидатов."""
+        candidates = index.new_candidates(changed, options['block_size'])
+        post_ids = sorted(set(candidates) - recompute)
+        rows = []
+        for chunk in batched(post_ids, DELETE_BATCH_SIZE):
+            lists = {post_id: list(candidates[post_id]) for post_id in chunk}
+            stored = RelatedPost.objects.filter(post_id__in=chunk)
+            for post_id, related_id, score in stored.values_list(
+                    'post_id', 'related_id', 'score'):
+                lists[post_id].append((related_id, score))
+            for post_id, scored in lists.items():
+                best = heapq.nlargest(options['per_post'], scored,
+                                      key=itemgetter(1))
+                rows.extend((post_id, related_id, score)
+                            for related_id, score in best)
+        return rows
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import COUNTERS
+
+
+class Command(BaseCommand):
+    help = ('Сбрасывает накопленные в кеше счётчики постов в базу. '
+            'Имеет смысл с общим кешем (memcached, redis).')
+
+    def handle(self, *args, **options):
+        for counter in COUNTERS:
+            total = counter.flush()
+            self.stdout.write(f'{counter.field}: +{total}')
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts.media_gc import collect_garbage
+
+GRACE_MINUTES = 60
+
+
+class Command(BaseCommand):
+    help = ('Удаляет файлы постов и миниатюры sorl, на которые не '
+            'ссылается ни один пост: заменённые и удалённые картинки, '
+            'их варианты и файлы, оставшиеся после hash_media. Память '
+            'не зависит от числа файлов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=GRACE_MINUTES,
+                            help='Не удалять файлы моложе стольких минут')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, ничего не удаляя')
+
+    def handle(self, *args, **options):
+        sources, thumbnails, files = collect_garbage(
+            dry_run=options['dry_run'],
+            grace=timedelta(minutes=options['grace']),
+        )
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: исходников в кеше миниатюр {sources}, '
+            f'миниатюр {thumbnails}, файлов {files}'))
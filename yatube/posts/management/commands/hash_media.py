@@ -0,0 +1,42 @@
+import json
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.storage import HASHED_NAME_RE
+from posts.models import Post
+
+CHUNK_SIZE = 200
+
+
+def rehash(name):
+    """Пересохраняет файл под именем по содержимому; старый файл
+    остаётся до gc_media."""
+    if HASHED_NAME_RE.match(name) or not default_storage.exists(name):
+        return name
+    with default_storage.open(name, 'rb') as file:
+        return default_storage.save(name, file)
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов и их варианты на имена по '
+            'содержимому. Прежние файлы затем удаляет gc_media.')
+
+    def handle(self, *args, **options):
+        moved = 0
+        posts = (Post.objects.exclude(image='').order_by('pk')
+                 .only('pk', 'image', 'image_variants'))
+        for post in posts.iterator(chunk_size=CHUNK_SIZE):
+            image = rehash(post.image.name)
+            variants = {
+                ext: [[width, height, rehash(name)]
+                      for width, height, name in files]
+                for ext, files in post.variants.items()
+            }
+            if image != post.image.name or variants != post.variants:
+                Post.objects.filter(pk=post.pk).update(
+                    image=image,
+                    image_variants=json.dumps(variants) if variants else '')
+                moved += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено постов: {moved}'))
@@ -0,0 +1,61 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.follows import bulk_follow
+from posts.models import User
+from posts.utils import batched
+
+from ._rows import FORMATS, guess_format, read_rows, report_bad_lines
+
+# В пачке до двух имён на строку, а SQLite по умолчанию ограничивает
+# запрос 999 параметрами.
+BATCH_SIZE = 400
+
+
+class Command(BaseCommand):
+    help = ('Импортирует граф подписок из JSONL или CSV. Поля строки: '
+            'user (подписчик) и author (username автора).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с подписками')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Формат файла (по умолчанию по расширению)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Количество подписок в одном bulk_create')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не найден')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        fmt = options['format'] or guess_format(path)
+
+        self.users = {}
+        created = skipped = 0
+        bad_lines = []
+        rows = read_rows(path, fmt, bad_lines)
+        for batch in batched(rows, options['batch_size']):
+            self.resolve(batch)
+            pairs = [(self.users.get(row.get('user')),
+                      self.users.get(row.get('author'))) for row in batch]
+            pairs = [pair for pair in pairs if None not in pair]
+            skipped += len(batch) - len(pairs)
+            created += bulk_follow(pairs, options['batch_size'])
+        report_bad_lines(self, bad_lines)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано подписок: {created}, '
+            f'пропущено: {skipped + len(bad_lines)}'
+        ))
+
+    def resolve(self, batch):
+        usernames = set()
+        for row in batch:
+            usernames.update((row.get('user'), row.get('author')))
+        usernames -= self.users.keys()
+        usernames.discard(None)
+        if usernames:
+            self.users.update(dict.fromkeys(usernames))
+            self.users.update(User.objects.filter(
+                username__in=usernames).values_list('username', 'id'))
@@ -0,0 +1,137 @@
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.models import Group, Post, User
+from posts.signals import posts_imported
+from posts.utils import batched
+
+from ._rows import FORMATS, guess_format, read_rows, report_bad_lines
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты из JSONL или CSV пачками через bulk_create. '
+            'Поля строки: text, author (username), group (slug), image.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с постами')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Формат файла (по умолчанию по расширению)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Количество постов в одной транзакции')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не найден')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        fmt = options['format'] or guess_format(path)
+
+        # username -> id и slug -> id; None запоминается для ненайденных,
+        # чтобы не спрашивать базу повторно.
+        self.authors = {}
+        self.groups = {}
+        self.image_field = Post._meta.get_field('image')
+        author_ids = set()
+        group_ids = set()
+        created = skipped = 0
+        bad_lines = []
+
+        rows = read_rows(path, fmt, bad_lines)
+        for batch in batched(rows, options['batch_size']):
+            self.resolve(batch)
+            posts = self.import_batch(batch)
+            created += len(posts)
+            skipped += len(batch) - len(posts)
+            author_ids.update(post.author_id for post in posts)
+            group_ids.update(post.group_id for post in posts if post.group_id)
+
+        if created:
+            posts_imported.send(sender=Post, author_ids=author_ids,
+                                group_ids=group_ids)
+        report_bad_lines(self, bad_lines)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {created}, '
+            f'пропущено: {skipped + len(bad_lines)}'
+        ))
+
+    def import_batch(self, batch):
+        """Сохраняет пачку в одной транзакции. Скопированные в неё
+        картинки удаляются, если транзакция откатилась."""
+        self.stored_images = []
+        try:
+            with transaction.atomic():
+                posts = [post for post in map(self.build_post, batch)
+                         if post is not None]
+                Post.objects.bulk_create(posts)
+        except Exception:
+            # Файл с тем же содержимым может уже принадлежать другому
+            # посту: хранилище по хешу не пишет его повторно.
+            used = set(Post.objects.filter(
+                image__in=self.stored_images).values_list('image', flat=True))
+            for name in set(self.stored_images) - used:
+                self.image_field.storage.delete(name)
+            raise
+        return posts
+
+    def resolve(self, batch):
+        """Дозагружает в карты авторов и группы, встреченные в пачке."""
+        usernames = {row.get('author') for row in batch} - self.authors.keys()
+        usernames.discard(None)
+        if usernames:
+            self.authors.update(dict.fromkeys(usernames))
+            self.authors.update(User.objects.filter(
+                username__in=usernames).values_list('username', 'id'))
+        slugs = {row.get('group') for row in batch} - self.groups.keys()
+        slugs.discard(None)
+        slugs.discard('')
+        if slugs:
+            self.groups.update(dict.fromkeys(slugs))
+            self.groups.update(Group.objects.filter(
+                slug__in=slugs).values_list('slug', 'id'))
+
+    def build_post(self, row):
+        text = (row.get('text') or '').strip()
+        author_id = self.authors.get(row.get('author'))
+        if not text or author_id is None:
+            return None
+        slug = row.get('group')
+        if slug and self.groups.get(slug) is None:
+            return None
+        image = self.store_image(row.get('image'))
+        if image is None:
+            return None
+        return Post(
+            text=text,
+            author_id=author_id,
+            group_id=self.groups.get(slug) if slug else None,
+            image=image,
+        )
+
+    def store_image(self, path):
+        """Относительный путь считается уже лежащим в MEDIA_ROOT,
+        абсолютный копируется в хранилище. Для относительного пути,
+        выходящего за MEDIA_ROOT, возвращает None: пост пропускается."""
+        if not path:
+            return ''
+        if not os.path.isabs(path):
+            name = posixpath.normpath(path)
+            if name == '..' or name.startswith('../'):
+                self.stderr.write(f'Картинка {path} вне MEDIA_ROOT, '
+                                  f'пост пропущен')
+                return None
+            return name
+        if not os.path.isfile(path):
+            return ''
+        name = self.image_field.generate_filename(None,
+                                                  os.path.basename(path))
+        with open(path, 'rb') as source:
+            name = self.image_field.storage.save(name, File(source))
+        self.stored_images.append(name)
+        return name
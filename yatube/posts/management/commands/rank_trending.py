@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import TRENDING_SIZE, rank_trending
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает снимок популярных постов. Запускается '
+            'по расписанию раз в несколько минут, например из cron: '
+            '*/5 * * * * python manage.py rank_trending')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=TRENDING_SIZE,
+                            help='Сколько мест хранить в снимке')
+
+    def handle(self, *args, **options):
+        ranked = rank_trending(size=options['size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Популярных постов: {ranked}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.archive import rebuild_date_buckets
+from posts.models import DateBucket
+
+
+class Command(BaseCommand):
+    help = ('Полностью пересчитывает дневные корзины архива по сайту '
+            'и по авторам.')
+
+    def handle(self, *args, **options):
+        rebuild_date_buckets()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано корзин: {DateBucket.objects.count()}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.groupstats import rebuild_group_stats
+from posts.models import GroupStats
+
+
+class Command(BaseCommand):
+    help = ('Полностью пересчитывает сводки сообществ: число постов, '
+            'время последнего поста и активность по дням.')
+
+    def handle(self, *args, **options):
+        rebuild_group_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано сообществ: {GroupStats.objects.count()}'))
@@ -0,0 +1,174 @@
+"""Сборка мусора в медиа: картинки постов, их варианты и миниатюры sorl.
+
+Файлы в хранилище и имена, на которые есть ссылки (Post.image, варианты,
+миниатюры в key-value хранилище sorl), сравниваются слиянием двух
+отсортированных потоков. Потоки сортируются внешней сортировкой:
+в памяти не больше RUN_SIZE имён, остальное — во временных файлах,
+поэтому память не зависит от числа файлов.
+
+Миниатюры исходников, которых больше нет ни у одного поста, удаляются
+через API key-value хранилища sorl вместе с записями о них.
+"""
+import heapq
+import json
+import posixpath
+import tempfile
+from datetime import timedelta
+from itertools import chain, islice
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from sorl.thumbnail import default as thumbnail_default
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from core.storage import thumbnail_prefix
+
+from .images import variant_names
+from .models import Post
+from .utils import batched
+
+RUN_SIZE = 50000
+BATCH_SIZE = 500
+MEDIA_DIR = 'posts'
+
+
+def write_run(names):
+    run = tempfile.TemporaryFile('w+', encoding='utf-8')
+    run.writelines(f'{name}\n' for name in names)
+    run.seek(0)
+    return run
+
+
+def read_run(run):
+    for line in run:
+        yield line[:-1]
+
+
+def external_sorted(names, run_size=RUN_SIZE):
+    """Сортирует поток имён, держа в памяти не больше run_size."""
+    runs = []
+    chunk = list(islice(names, run_size))
+    while len(chunk) == run_size:
+        runs.append(write_run(sorted(chunk)))
+        chunk = list(islice(names, run_size))
+    chunk.sort()
+    if not runs:
+        yield from chunk
+        return
+    runs.append(write_run(chunk))
+    try:
+        yield from heapq.merge(*(read_run(run) for run in runs))
+    finally:
+        for run in runs:
+            run.close()
+
+
+def sorted_difference(left, right):
+    """Имена из отсортированного left, которых нет в отсортированном
+    right; повторы допускаются в обоих потоках."""
+    right = iter(right)
+    current = next(right, None)
+    previous = None
+    for name in left:
+        if name == previous:
+            continue
+        previous = name
+        while current is not None and current < name:
+            current = next(right, None)
+        if current != name:
+            yield name
+
+
+def stored_files(directory):
+    if not default_storage.exists(directory):
+        return
+    directories, files = default_storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from stored_files(posixpath.join(directory, name))
+
+
+def kvstore_images(batch_size=BATCH_SIZE):
+    """Пары (ключ, значение) записей sorl об исходниках и миниатюрах.
+
+    Читаются страницами по ключу, чтобы между страницами можно было
+    удалять записи."""
+    prefix = add_prefix('', 'image')
+    last_key = prefix
+    while True:
+        rows = list(KVStore.objects
+                    .filter(key__startswith=prefix, key__gt=last_key)
+                    .order_by('key').values_list('key', 'value')
+                    [:batch_size])
+        if not rows:
+            return
+        yield rows
+        last_key = rows[-1][0]
+
+
+def referenced_files():
+    rows = Post.objects.exclude(image='').values_list('image',
+                                                      'image_variants')
+    for image, variants in rows.iterator():
+        yield image
+        if variants:
+            yield from variant_names(json.loads(variants))
+    prefix = thumbnail_prefix()
+    for rows in kvstore_images():
+        for _, value in rows:
+            name = json.loads(value)['name']
+            if name.startswith(prefix):
+                yield name
+
+
+def prune_thumbnails(dry_run, batch_size=BATCH_SIZE):
+    """Удаляет миниатюры исходников, на которые не ссылается ни один
+    пост. Возвращает (исходников, миниатюр)."""
+    kvstore = thumbnail_default.kvstore
+    prefix = thumbnail_prefix()
+    sources = thumbnails = 0
+    for rows in kvstore_images(batch_size):
+        images = [deserialize_image_file(value) for _, value in rows]
+        images = [image for image in images
+                  if not image.name.startswith(prefix)]
+        used = set(Post.objects.filter(
+            image__in=[image.name for image in images]
+        ).values_list('image', flat=True))
+        for image in images:
+            if image.name in used:
+                continue
+            sources += 1
+            thumbnails += len(kvstore._get(image.key,
+                                           identity='thumbnails') or [])
+            if not dry_run:
+                kvstore.delete(image)
+    return sources, thumbnails
+
+
+def delete_orphans(dry_run, grace, batch_size=BATCH_SIZE):
+    """Удаляет файлы постов и миниатюры без ссылок старше grace.
+    Возвращает число файлов."""
+    cutoff = timezone.now() - grace
+    stored = external_sorted(chain(
+        stored_files(MEDIA_DIR),
+        stored_files(thumbnail_prefix().rstrip('/')),
+    ))
+    orphans = sorted_difference(stored, external_sorted(referenced_files()))
+    deleted = 0
+    for batch in batched(orphans, batch_size):
+        for name in batch:
+            if default_storage.get_modified_time(name) > cutoff:
+                continue
+            if not dry_run:
+                default_storage.delete(name)
+            deleted += 1
+    return deleted
+
+
+def collect_garbage(dry_run=False, grace=timedelta(hours=1)):
+    sources, thumbnails = prune_thumbnails(dry_run)
+    files = delete_orphans(dry_run, grace)
+    return sources, thumbnails, files
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_group_stats(apps, schema_editor):
+    """Сигналы ведут сводки только для новых постов, поэтому
+    существующие посты учитываются здесь."""
+    from posts.groupstats import rebuild_group_stats
+
+    rebuild_group_stats(
+        post_model=apps.get_model('posts', 'Post'),
+        stats_model=apps.get_model('posts', 'GroupStats'),
+        activity_model=apps.get_model('posts', 'GroupActivity'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_trendingpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('last_post_at', models.DateTimeField(null=True, verbose_name='Последний пост')),
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='posts.Group', verbose_name='Сообщество')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='posts.Group', verbose_name='Сообщество')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='groupactivity',
+            index=models.Index(fields=['day'], name='group_activity_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupactivity',
+            constraint=models.UniqueConstraint(fields=('group', 'day'), name='unique_group_activity'),
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:01
+
+from django.db import migrations, models
+
+
+def fill_date_buckets(apps, schema_editor):
+    """Сигналы ведут корзины только для новых постов, поэтому
+    существующие посты учитываются здесь."""
+    from posts.archive import rebuild_date_buckets
+
+    rebuild_date_buckets(
+        post_model=apps.get_model('posts', 'Post'),
+        bucket_model=apps.get_model('posts', 'DateBucket'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_group_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DateBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('site', 'Весь сайт'), ('author', 'Автор')], max_length=10, verbose_name='Срез')),
+                ('scope_id', models.PositiveIntegerField(default=0, verbose_name='id автора')),
+                ('day', models.DateField(verbose_name='День')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='datebucket',
+            constraint=models.UniqueConstraint(fields=('scope', 'scope_id', 'day'), name='unique_date_bucket'),
+        ),
+        migrations.RunPython(fill_date_buckets, migrations.RunPython.noop),
+    ]
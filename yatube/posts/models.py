@@ -1,3 +1,5 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import UniqueConstraint
@@ -25,6 +27,11 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    # Валидатор RSS/Atom: правка поста должна менять ленту.
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -44,15 +51,63 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    views_count = models.PositiveIntegerField(
+        'Просмотры',
+        default=0,
+        editable=False
+    )
+    likes_count = models.PositiveIntegerField(
+        'Лайки',
+        default=0,
+        editable=False
+    )
+    # Размеры и заглушка считаются при загрузке (posts.images), чтобы
+    # шаблонам не нужно было открывать файл.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        default='',
+        editable=False
+    )
+    # JSON-описание нарезанных вариантов картинки, см. posts.images.
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        default='',
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date'], name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:STRING_LEN]
 
+    @property
+    def variants(self):
+        return json.loads(self.image_variants) if self.image_variants else {}
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -71,6 +126,10 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['created'],
+                                name='comment_created_idx')]
+
 
 class Follow(models.Model):
     author = models.ForeignKey(
@@ -89,3 +148,144 @@ class Follow(models.Model):
     class Meta:
         constraints = [UniqueConstraint(fields=['author', 'user'],
                        name='unique_follower')]
+        indexes = [
+            models.Index(fields=['author', '-id'],
+                         name='follow_author_id_idx'),
+            models.Index(fields=['user', '-id'], name='follow_user_id_idx'),
+        ]
+
+
+class Like(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='likes'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='likes'
+    )
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=['user', 'post'],
+                       name='unique_like')]
+
+
+class Recommendation(models.Model):
+    """Предрассчитанная рекомендация автора; заполняется командой
+    build_recommendations."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='recommendations'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Рекомендуемый автор',
+        related_name='+'
+    )
+    score = models.FloatField('Вес')
+
+    class Meta:
+        ordering = ('-score',)
+        constraints = [UniqueConstraint(fields=['user', 'author'],
+                       name='unique_recommendation')]
+        indexes = [models.Index(fields=['user', '-score'],
+                                name='recommendation_user_score_idx')]
+
+
+class RelatedPost(models.Model):
+    """Похожий пост по TF-IDF; заполняется командой build_related_posts."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='related'
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Похожий пост',
+        related_name='+'
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        ordering = ('-score',)
+        constraints = [UniqueConstraint(fields=['post', 'related'],
+                       name='unique_related_post')]
+        indexes = [models.Index(fields=['post', '-score'],
+                                name='related_post_score_idx')]
+
+
+class TrendingPost(models.Model):
+    """Место поста в снимке популярного; пересчитывается командой
+    rank_trending."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='trending'
+    )
+    rank = models.PositiveIntegerField('Место', unique=True)
+    score = models.FloatField('Вес')
+    computed = models.DateTimeField('Рассчитано')
+
+    class Meta:
+        ordering = ('rank',)
+
+
+class GroupStats(models.Model):
+    """Счётчики сообщества; поддерживаются сигналами постов
+    и пересчитываются командой rebuild_group_stats."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        verbose_name='Сообщество',
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    last_post_at = models.DateTimeField('Последний пост', null=True)
+
+
+class GroupActivity(models.Model):
+    """Число постов сообщества за день."""
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        verbose_name='Сообщество',
+        related_name='activity'
+    )
+    day = models.DateField('День')
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=['group', 'day'],
+                       name='unique_group_activity')]
+        indexes = [models.Index(fields=['day'],
+                                name='group_activity_day_idx')]
+
+
+class DateBucket(models.Model):
+    """Число постов за день по всему сайту или у одного автора; по этим
+    строкам строится навигация архива. Для сообществ та же роль
+    у GroupActivity."""
+    SITE = 'site'
+    AUTHOR = 'author'
+    SCOPES = (
+        (SITE, 'Весь сайт'),
+        (AUTHOR, 'Автор'),
+    )
+    scope = models.CharField('Срез', max_length=10, choices=SCOPES)
+    scope_id = models.PositiveIntegerField('id автора', default=0)
+    day = models.DateField('День')
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=['scope', 'scope_id', 'day'],
+                       name='unique_date_bucket')]
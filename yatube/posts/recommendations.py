@@ -0,0 +1,100 @@
+"""Офлайн-расчёт рекомендаций «на кого подписаться».
+
+Граф подписок и комментариев загружается в разреженные матрицы:
+F[u, a] = 1, если u подписан на a; C[u, p] = 1, если u комментировал
+пост p. Вес кандидата a для пользователя u:
+
+    FOLLOW_WEIGHT * (F @ F)[u, a]   — сколько моих авторов читают a;
+    COMMENT_WEIGHT * (C @ C.T)[u, a] — на скольких постах мы с a
+                                        комментировали вместе.
+
+Матрицы перемножаются блоками строк, чтобы память не росла как n².
+"""
+import numpy as np
+from scipy import sparse
+
+from .models import Comment, Follow, Post, User
+
+FOLLOW_WEIGHT = 1.0
+COMMENT_WEIGHT = 0.5
+BLOCK_SIZE = 2000
+
+
+def id_index(ids):
+    """Отсортированный массив id и функция id -> номер строки."""
+    ids = np.unique(np.asarray(ids, dtype=np.int64))
+    return ids, lambda values: np.searchsorted(ids, values)
+
+
+def load_pairs(queryset, *fields):
+    pairs = np.fromiter(
+        (value for row in queryset.values_list(*fields).iterator()
+         for value in row),
+        dtype=np.int64,
+    )
+    return pairs.reshape(-1, len(fields))
+
+
+def binary_matrix(rows, cols, shape):
+    data = np.ones(len(rows), dtype=np.float32)
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=shape)
+    matrix.data[:] = 1
+    return matrix
+
+
+def top_k(row_scores, k):
+    """Номера и веса k лучших ненулевых элементов строки csr."""
+    if row_scores.nnz <= k:
+        order = np.argsort(-row_scores.data)
+    else:
+        order = np.argpartition(-row_scores.data, k)[:k]
+        order = order[np.argsort(-row_scores.data[order])]
+    return row_scores.indices[order], row_scores.data[order]
+
+
+def build_recommendations(per_user, block_size=BLOCK_SIZE):
+    """Возвращает генератор (user_id, author_id, score)."""
+    user_ids, user_index = id_index(
+        list(User.objects.values_list('id', flat=True).iterator()))
+    n_users = len(user_ids)
+    if not n_users:
+        return
+
+    follows = load_pairs(Follow.objects.all(), 'user_id', 'author_id')
+    following = binary_matrix(user_index(follows[:, 0]),
+                              user_index(follows[:, 1]),
+                              (n_users, n_users))
+
+    comments = load_pairs(Comment.objects.all(), 'author_id', 'post_id')
+    post_ids, post_index = id_index(comments[:, 1])
+    commented = binary_matrix(user_index(comments[:, 0]),
+                              post_index(comments[:, 1]),
+                              (n_users, len(post_ids)))
+    commented_t = commented.T.tocsr()
+
+    # Рекомендуются только те, у кого есть посты.
+    authors = np.zeros(n_users, dtype=np.float32)
+    authors[user_index(np.fromiter(
+        Post.objects.values_list('author_id', flat=True).distinct()
+        .order_by().iterator(), dtype=np.int64))] = 1
+    author_mask = sparse.diags(authors)
+
+    for start in range(0, n_users, block_size):
+        stop = min(start + block_size, n_users)
+        block_following = following[start:stop]
+        scores = (FOLLOW_WEIGHT * (block_following @ following)
+                  + COMMENT_WEIGHT * (commented[start:stop] @ commented_t))
+        scores = sparse.csr_matrix(scores @ author_mask)
+        # Убираем уже читаемых авторов и самого пользователя.
+        rows = np.arange(stop - start)
+        itself = binary_matrix(rows, rows + start, scores.shape)
+        scores = scores - scores.multiply(block_following + itself)
+        scores.eliminate_zeros()
+        for row in range(stop - start):
+            row_scores = scores.getrow(row)
+            if not row_scores.nnz:
+                continue
+            columns, values = top_k(row_scores, per_user)
+            for column, value in zip(columns, values):
+                yield (int(user_ids[start + row]), int(user_ids[column]),
+                       float(value))
@@ -0,0 +1,181 @@
+"""TF-IDF индекс текстов постов и поиск похожих.
+
+Векторы строк нормированы, поэтому косинусное сходство — обычное
+произведение X[block] @ X.T; матрица считается блоками строк.
+Словарь, IDF, векторы и хеши текстов сохраняются в .npz, чтобы
+инкрементальный запуск векторизовал только новые и изменённые посты.
+Словарь и IDF при этом не меняются, поэтому сходство двух неизменённых
+постов остаётся прежним и их сохранённые списки похожих можно
+дополнять, а не пересчитывать.
+"""
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from .recommendations import top_k
+
+TOKEN_RE = re.compile(r'\w{2,}')
+# Слово должно встречаться хотя бы в двух постах и не больше чем
+# в половине: единичные слова не дают сходства, частые — шум.
+MIN_DF = 2
+MAX_DF_RATIO = 0.5
+MIN_SCORE = 0.05
+BLOCK_SIZE = 1000
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def text_hashes(texts):
+    return np.fromiter((zlib.crc32(text.encode()) for text in texts),
+                       dtype=np.uint32, count=len(texts))
+
+
+def normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+class TfidfIndex:
+    def __init__(self, terms, idf, ids, hashes, vectors):
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.idf = idf
+        self.ids = ids
+        self.hashes = hashes
+        self.vectors = vectors
+
+    @classmethod
+    def fit(cls, ids, texts):
+        tokens = [tokenize(text) for text in texts]
+        df = Counter(term for doc in tokens for term in set(doc))
+        max_df = max(MIN_DF, MAX_DF_RATIO * len(texts))
+        terms = sorted(term for term, count in df.items()
+                       if MIN_DF <= count <= max_df)
+        counts = np.array([df[term] for term in terms], dtype=np.float64)
+        idf = np.log((1 + len(texts)) / (1 + counts)) + 1
+        index = cls(terms, idf, np.asarray(ids, dtype=np.int64),
+                    text_hashes(texts), None)
+        index.vectors = index.transform(tokens)
+        return index
+
+    def transform(self, tokens):
+        """Векторы для уже разбитых на слова текстов; новые слова,
+        которых нет в словаре, пропускаются до полного пересчёта."""
+        rows, cols = [], []
+        for row, doc in enumerate(tokens):
+            term_ids = [self.vocabulary[term] for term in doc
+                        if term in self.vocabulary]
+            rows.extend([row] * len(term_ids))
+            cols.extend(term_ids)
+        data = np.ones(len(rows), dtype=np.float32)
+        tf = sparse.csr_matrix((data, (rows, cols)),
+                               shape=(len(tokens), len(self.terms)))
+        tf.sum_duplicates()
+        tf.data = 1 + np.log(tf.data)
+        return normalize_rows(tf @ sparse.diags(self.idf.astype(np.float32)))
+
+    def update(self, ids, texts):
+        """Переносит векторы неизменённых постов и считает остальные.
+        ids должны быть отсортированы. Возвращает id новых и изменённых
+        постов и прежние векторы изменённых и удалённых: по ним
+        находятся посты, в чьих списках похожих они могли быть."""
+        ids = np.asarray(ids, dtype=np.int64)
+        hashes = text_hashes(texts)
+        survived = np.zeros(len(self.ids), dtype=bool)
+        if len(self.ids):
+            positions = np.minimum(np.searchsorted(self.ids, ids),
+                                   len(self.ids) - 1)
+            kept = ((self.ids[positions] == ids)
+                    & (self.hashes[positions] == hashes))
+            survived[positions[kept]] = True
+        else:
+            positions = np.zeros(len(ids), dtype=np.int64)
+            kept = np.zeros(len(ids), dtype=bool)
+        stale = self.vectors[np.flatnonzero(~survived)]
+        changed = np.flatnonzero(~kept)
+        vectors = sparse.vstack([
+            self.vectors[positions[kept]],
+            self.transform([tokenize(texts[i]) for i in changed]),
+        ]).tocsr()
+        order = np.argsort(np.concatenate([np.flatnonzero(kept), changed]))
+        self.vectors = vectors[order]
+        self.ids = ids
+        self.hashes = hashes
+        return ids[changed], stale
+
+    def scores_against(self, vectors, block_size=BLOCK_SIZE):
+        """Генератор (post_id, столбец vectors, score) для всех постов
+        индекса со сходством не ниже MIN_SCORE."""
+        vectors_t = vectors.T.tocsr()
+        for start in range(0, len(self.ids), block_size):
+            scores = (self.vectors[start:start + block_size]
+                      @ vectors_t).tocoo()
+            keep = scores.data >= MIN_SCORE
+            for row, column, score in zip(scores.row[keep],
+                                          scores.col[keep],
+                                          scores.data[keep]):
+                yield int(self.ids[start + row]), int(column), float(score)
+
+    def touched_by(self, vectors, block_size=BLOCK_SIZE):
+        """id постов, похожих хотя бы на один из векторов."""
+        return {post_id for post_id, _, _
+                in self.scores_against(vectors, block_size)}
+
+    def new_candidates(self, post_ids, block_size=BLOCK_SIZE):
+        """{id поста: [(id из post_ids, score), ...]} — сходство всех
+        постов индекса с указанными, кроме самих указанных."""
+        post_ids = np.asarray(post_ids, dtype=np.int64)
+        vectors = self.vectors[np.searchsorted(self.ids, post_ids)]
+        excluded = set(post_ids.tolist())
+        candidates = {}
+        for post_id, column, score in self.scores_against(vectors,
+                                                          block_size):
+            if post_id not in excluded:
+                candidates.setdefault(post_id, []).append(
+                    (int(post_ids[column]), score))
+        return candidates
+
+    def neighbours(self, post_ids, per_post, block_size=BLOCK_SIZE):
+        """Генератор (post_id, related_id, score) для указанных постов."""
+        rows = np.searchsorted(self.ids, post_ids)
+        all_t = self.vectors.T.tocsr()
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            scores = self.vectors[block] @ all_t
+            itself = sparse.csr_matrix(
+                (np.ones(len(block)), (np.arange(len(block)), block)),
+                shape=scores.shape)
+            scores = scores - scores.multiply(itself)
+            scores.data[scores.data < MIN_SCORE] = 0
+            scores.eliminate_zeros()
+            for i, row in enumerate(block):
+                row_scores = scores.getrow(i)
+                if not row_scores.nnz:
+                    continue
+                columns, values = top_k(row_scores, per_post)
+                for column, value in zip(columns, values):
+                    yield (int(self.ids[row]), int(self.ids[column]),
+                           float(value))
+
+    def save(self, path):
+        np.savez_compressed(
+            path, terms=np.array(self.terms, dtype=str), idf=self.idf,
+            ids=self.ids, hashes=self.hashes, data=self.vectors.data,
+            indices=self.vectors.indices, indptr=self.vectors.indptr,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as stored:
+            terms = stored['terms'].tolist()
+            vectors = sparse.csr_matrix(
+                (stored['data'], stored['indices'], stored['indptr']),
+                shape=(len(stored['ids']), len(terms)))
+            return cls(terms, stored['idf'], stored['ids'],
+                       stored['hashes'], vectors)
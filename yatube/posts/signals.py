@@ -0,0 +1,119 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .archive import rebuild_date_buckets, record_post_day
+from .counters import likes_counter
+from .follows import adjust_followers_count
+from .groupstats import rebuild_group_stats, record_post
+from .images import reset_post_image
+from .idsets import following_authors, liked_posts
+from .models import Follow, Like, Post
+from .timeline import drop_recent, invalidate_recent, push_recent
+
+# bulk_create не вызывает post_save, поэтому после массового импорта
+# отправляется этот сигнал: обработчики пересчитывают счётчики, кеши
+# и прочие производные данные один раз для всей пачки.
+posts_imported = Signal(providing_args=['author_ids', 'group_ids'])
+
+
+@receiver(post_save, sender=Follow)
+def add_following(sender, instance, created, **kwargs):
+    if created:
+        following_authors.update(instance.user_id, instance.author_id, True)
+        adjust_followers_count(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_following(sender, instance, **kwargs):
+    following_authors.update(instance.user_id, instance.author_id, False)
+    adjust_followers_count(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Like)
+def count_like(sender, instance, created, **kwargs):
+    if created:
+        likes_counter.add(instance.post_id, 1)
+        liked_posts.update(instance.user_id, instance.post_id, True)
+
+
+@receiver(post_delete, sender=Like)
+def uncount_like(sender, instance, **kwargs):
+    # Срабатывает и при каскадном удалении вместе с постом
+    # или пользователем.
+    likes_counter.add(instance.post_id, -1)
+    liked_posts.update(instance.user_id, instance.post_id, False)
+
+
+@receiver(post_save, sender=Post)
+def add_recent_post(sender, instance, created, **kwargs):
+    if created:
+        push_recent(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_recent_post(sender, instance, **kwargs):
+    drop_recent(instance)
+
+
+@receiver(posts_imported)
+def reset_recent_posts(sender, author_ids, **kwargs):
+    invalidate_recent(author_ids)
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_fields(sender, instance, **kwargs):
+    # Старая группа нужна, чтобы перенести пост между сводками
+    # при редактировании, старая картинка — чтобы заметить её замену.
+    if not instance._state.adding:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image').first() or (None, None))
+
+
+@receiver(post_save, sender=Post)
+def count_group_post(sender, instance, created, **kwargs):
+    old_group_id = None if created else instance.__dict__.pop(
+        '_saved_group_id', None)
+    if old_group_id == instance.group_id:
+        return
+    if old_group_id:
+        record_post(old_group_id, instance.pub_date, -1)
+    if instance.group_id:
+        record_post(instance.group_id, instance.pub_date, 1)
+
+
+@receiver(post_save, sender=Post)
+def reset_replaced_image(sender, instance, created, **kwargs):
+    if '_saved_image' not in instance.__dict__:
+        return
+    old_image = instance.__dict__.pop('_saved_image') or ''
+    if old_image != (instance.image.name or ''):
+        reset_post_image(instance)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_group_post(sender, instance, **kwargs):
+    if instance.group_id:
+        record_post(instance.group_id, instance.pub_date, -1)
+
+
+@receiver(posts_imported)
+def rebuild_imported_groups(sender, group_ids, **kwargs):
+    if group_ids:
+        rebuild_group_stats(group_ids)
+
+
+@receiver(post_save, sender=Post)
+def count_post_day(sender, instance, created, **kwargs):
+    if created:
+        record_post_day(instance, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post_day(sender, instance, **kwargs):
+    record_post_day(instance, -1)
+
+
+@receiver(posts_imported)
+def rebuild_imported_days(sender, author_ids, **kwargs):
+    rebuild_date_buckets(author_ids)
@@ -0,0 +1,117 @@
+from xml.sax.saxutils import escape
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.urls import reverse
+
+from .models import Group, Post, User
+
+# Протокол допускает 50 000 адресов в файле, но раздел такого размера
+# не помещается в одну запись memcached, поэтому разделы меньше.
+URLS_PER_SITEMAP = 10000
+CHUNK_SIZE = 1000
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+
+URLSET_OPEN = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<urlset xmlns="http://www.sitemaps.org/schemas/'
+               'sitemap/0.9">\n')
+URLSET_CLOSE = '</urlset>\n'
+
+
+class Section:
+    """Раздел карты сайта, разбитый на страницы по диапазонам id.
+
+    Страница page содержит объекты с id из
+    [(page - 1) * URLS_PER_SITEMAP, page * URLS_PER_SITEMAP), поэтому
+    ни OFFSET, ни подсчёт всей таблицы не нужны.
+    """
+
+    def __init__(self, name, model, fields, location, lastmod=None):
+        self.name = name
+        self.model = model
+        self.fields = ('id',) + fields
+        self.location = location
+        self.lastmod = lastmod
+
+    def num_pages(self):
+        max_id = self.model.objects.aggregate(max_id=Max('id'))['max_id']
+        return 0 if max_id is None else max_id // URLS_PER_SITEMAP + 1
+
+    def page_queryset(self, page):
+        start = (page - 1) * URLS_PER_SITEMAP
+        return self.model.objects.filter(
+            id__gte=start, id__lt=start + URLS_PER_SITEMAP
+        ).order_by('id')
+
+    def rows(self, page):
+        """Обходит страницу кусками по CHUNK_SIZE с ключом по id."""
+        queryset = self.page_queryset(page).values_list(*self.fields)
+        chunk = list(queryset[:CHUNK_SIZE])
+        while chunk:
+            yield from chunk
+            chunk = list(queryset.filter(id__gt=chunk[-1][0])[:CHUNK_SIZE])
+
+    def cache_key(self, page, base_url):
+        """Ключ меняется, только когда меняется набор id в диапазоне."""
+        state = self.page_queryset(page).aggregate(
+            count=Count('id'), max_id=Max('id'))
+        return (f'sitemap:{self.name}:{page}:{state["count"]}:'
+                f'{state["max_id"]}:{base_url}')
+
+    def render(self, page, base_url):
+        yield URLSET_OPEN
+        for row in self.rows(page):
+            entry = f'<url><loc>{escape(base_url + self.location(row))}</loc>'
+            if self.lastmod is not None:
+                entry += f'<lastmod>{self.lastmod(row)}</lastmod>'
+            yield entry + '</url>\n'
+        yield URLSET_CLOSE
+
+    def stream(self, page, base_url):
+        """Отдаёт страницу из кеша или рендерит её потоково,
+        сохраняя результат в кеш после последнего куска."""
+        key = self.cache_key(page, base_url)
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for part in self.render(page, base_url):
+            parts.append(part)
+            yield part
+        cache.set(key, ''.join(parts), SITEMAP_CACHE_TIMEOUT)
+
+
+SECTIONS = {
+    section.name: section for section in (
+        Section(
+            'posts', Post, ('pub_date',),
+            lambda row: reverse('posts:post_detail', args=[row[0]]),
+            lambda row: row[1].date().isoformat(),
+        ),
+        Section(
+            'profiles', User, ('username',),
+            lambda row: reverse('posts:profile', args=[row[1]]),
+        ),
+        Section(
+            'groups', Group, ('slug',),
+            lambda row: reverse('posts:group_list', args=[row[1]]),
+        ),
+    )
+}
+
+
+def render_index(base_url):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/'
+             'sitemap/0.9">\n']
+    for section in SECTIONS.values():
+        for page in range(1, section.num_pages() + 1):
+            location = reverse('posts:sitemap_section',
+                               args=[section.name, page])
+            lines.append(
+                f'<sitemap><loc>{escape(base_url + location)}</loc>'
+                f'</sitemap>\n'
+            )
+    lines.append('</sitemapindex>\n')
+    return ''.join(lines)
@@ -0,0 +1,53 @@
+from django import template
+from django.core.files.storage import default_storage
+
+register = template.Library()
+
+SIZES = '(max-width: 960px) 100vw, 960px'
+# Размер миниатюры sorl для постов без вариантов.
+THUMBNAIL_SIZE = (960, 339)
+
+
+def thumbnail_size(post):
+    """Размер миниатюры sorl: кадр ленты, уменьшенный под сохранённые
+    размеры исходника, чтобы не растягивать маленькие картинки."""
+    width, height = THUMBNAIL_SIZE
+    if post.image_width and post.image_height:
+        width = max(min(width, post.image_width,
+                        post.image_height * width // height), 1)
+        height = max(round(width * THUMBNAIL_SIZE[1] / THUMBNAIL_SIZE[0]),
+                     1)
+    return width, height
+
+
+def srcset(files):
+    return ', '.join(f'{default_storage.url(name)} {width}w'
+                     for width, _, name in files)
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(post, sizes=SIZES, lazy=True):
+    """<picture> с WebP и JPEG разной ширины по сохранённому описанию
+    вариантов; без вариантов — прежняя миниатюра sorl. Размеры и
+    заглушка берутся из полей поста, файл не открывается."""
+    variants = post.variants
+    width, height = thumbnail_size(post)
+    context = {
+        'post': post,
+        'sizes': sizes,
+        'lazy': lazy,
+        'placeholder': post.image_placeholder,
+        'geometry': f'{width}x{height}',
+        'width': width,
+        'height': height,
+    }
+    if variants:
+        width, height, name = variants['jpeg'][-1]
+        context.update(
+            webp_srcset=srcset(variants['webp']),
+            jpeg_srcset=srcset(variants['jpeg']),
+            src=default_storage.url(name),
+            width=width,
+            height=height,
+        )
+    return context
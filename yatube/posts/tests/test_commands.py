@@ -0,0 +1,485 @@
+import importlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.models import KVStore
+
+from ..media_gc import external_sorted, sorted_difference, stored_files
+from ..models import (Comment, DateBucket, Follow, Group, GroupActivity,
+                      GroupStats, Post, Recommendation, RelatedPost,
+                      TrendingPost, User)
+from ..recommendations import build_recommendations
+from ..related import TfidfIndex
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def run_data_migration(name, function):
+    """Вызывает функцию RunPython миграции posts с её историческими
+    моделями."""
+    migration = importlib.import_module(f'posts.migrations.{name}')
+    state = MigrationLoader(connection).project_state(('posts', name))
+    getattr(migration, function)(state.apps, None)
+
+
+def track_atomic_depth(generator):
+    """Обёртка генератора, запоминающая глубину вложенности
+    transaction.atomic на каждой выданной строке."""
+    depths = []
+
+    def wrapper(*args, **kwargs):
+        for row in generator(*args, **kwargs):
+            depths.append(len(connection.savepoint_ids))
+            yield row
+    return wrapper, depths
+
+
+class ImportPostsCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def write_file(self, name, content):
+        path = os.path.join(TEMP_DIR, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_import_jsonl(self):
+        """Команда импортирует посты пачками и пропускает чужих авторов."""
+        rows = [
+            {'text': 'Пост в группе', 'author': 'auth', 'group': 'test_slug'},
+            {'text': 'Пост без группы', 'author': 'auth'},
+            {'text': 'Пост неизвестного автора', 'author': 'nobody'},
+        ]
+        path = self.write_file(
+            'posts.jsonl', '\n'.join(json.dumps(row) for row in rows))
+        call_command('import_posts', path, batch_size=2, stdout=StringIO())
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 2)
+        self.assertTrue(Post.objects.filter(
+            text='Пост в группе', group=self.group).exists())
+        self.assertFalse(Post.objects.filter(
+            text='Пост неизвестного автора').exists())
+
+    def test_import_csv(self):
+        path = self.write_file(
+            'posts.csv',
+            'text,author,group,image\n'
+            'Пост из CSV,auth,test_slug,posts/old.jpg\n'
+        )
+        call_command('import_posts', path, stdout=StringIO())
+        post = Post.objects.get(text='Пост из CSV')
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.image.name, 'posts/old.jpg')
+
+    def test_malformed_lines_reported(self):
+        """Битые строки JSONL пропускаются с номером, остальные
+        импортируются."""
+        path = self.write_file(
+            'broken.jsonl',
+            '{"text": "Первый", "author": "auth"}\n'
+            '{"text": "Оборванный", \n'
+            '[1, 2]\n'
+            '{"text": "Последний", "author": "auth"}\n'
+        )
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, stdout=out, stderr=err)
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 2)
+        self.assertIn('Строка 2:', err.getvalue())
+        self.assertIn('Строка 3:', err.getvalue())
+        self.assertIn('пропущено: 2', out.getvalue())
+
+    def test_image_outside_media_root_rejected(self):
+        """Относительный путь картинки нормализуется, а выходящий
+        за MEDIA_ROOT отклоняется вместе с постом."""
+        path = self.write_file(
+            'paths.jsonl',
+            '{"text": "Обычный", "author": "auth", '
+            '"image": "posts/./a/../cat.jpg"}\n'
+            '{"text": "Чужой", "author": "auth", '
+            '"image": "posts/../../secret.txt"}\n'
+        )
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, stdout=out, stderr=err)
+        self.assertEqual(
+            list(Post.objects.filter(author=self.user)
+                 .values_list('text', 'image')),
+            [('Обычный', 'posts/cat.jpg')])
+        self.assertIn('posts/../../secret.txt', err.getvalue())
+        self.assertIn('пропущено: 1', out.getvalue())
+
+    def test_rollback_removes_copied_images(self):
+        """Если пачка откатилась, скопированные картинки удаляются."""
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        image = os.path.join(TEMP_DIR, 'import.png')
+        Image.new('RGB', (10, 10)).save(image)
+        path = self.write_file('images.jsonl', json.dumps(
+            {'text': 'С картинкой', 'author': 'auth', 'image': image}))
+        with mock.patch.object(Post.objects, 'bulk_create',
+                               side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(list(stored_files('posts')), [])
+
+
+class ImportFollowsCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_import_follows_ignores_duplicates(self):
+        """Повторные и неизвестные подписки не ломают импорт."""
+        Follow.objects.create(author=self.author, user=self.reader)
+        path = os.path.join(TEMP_DIR, 'follows.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('user,author\n'
+                       'reader,auth\n'
+                       'auth,reader\n'
+                       'auth,nobody\n')
+        call_command('import_follows', path, stdout=StringIO())
+        self.assertTrue(Follow.objects.filter(
+            author=self.reader, user=self.author).exists())
+        self.assertEqual(Follow.objects.count(), 2)
+
+
+class BuildRecommendationsCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.author = User.objects.create_user(username='auth')
+        cls.commenter = User.objects.create_user(username='commenter')
+        cls.silent = User.objects.create_user(username='silent')
+        Follow.objects.create(user=cls.reader, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.author)
+        Follow.objects.create(user=cls.friend, author=cls.silent)
+        for user in (cls.friend, cls.author, cls.commenter, cls.reader):
+            Post.objects.create(author=user, text='Тестовый пост')
+        post = Post.objects.filter(author=cls.friend).get()
+        for user in (cls.reader, cls.commenter):
+            Comment.objects.create(post=post, author=user, text='Комментарий')
+
+    def test_recommends_friends_of_friends_and_cocommenters(self):
+        """В рекомендации попадают авторы друзей и соседи по комментариям,
+        но не уже читаемые авторы, не сам пользователь и не авторы
+        без постов."""
+        Recommendation.objects.create(user=self.reader, author=self.friend,
+                                      score=100)
+        call_command('build_recommendations', '--block-size', '2',
+                     stdout=StringIO())
+        recommended = list(Recommendation.objects.filter(user=self.reader)
+                           .values_list('author__username', 'score'))
+        self.assertEqual(recommended, [('auth', 1.0), ('commenter', 0.5)])
+
+    def test_per_user_limit(self):
+        """Для каждого пользователя хранится не больше --per-user авторов."""
+        call_command('build_recommendations', '--per-user', '1',
+                     stdout=StringIO())
+        self.assertEqual(
+            Recommendation.objects.filter(user=self.reader).count(), 1)
+
+    def test_computed_outside_transaction(self):
+        """Рекомендации считаются до транзакции, которая заменяет
+        таблицу."""
+        wrapper, depths = track_atomic_depth(build_recommendations)
+        with mock.patch('posts.management.commands.build_recommendations.'
+                        'build_recommendations', wrapper):
+            call_command('build_recommendations', stdout=StringIO())
+        self.assertTrue(depths)
+        self.assertEqual(set(depths), {len(connection.savepoint_ids)})
+
+
+class BuildRelatedPostsCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошки любят спать на солнце')
+        cls.kittens = Post.objects.create(
+            author=cls.user, text='Котята тоже любят спать на солнце')
+        cls.cars = Post.objects.create(
+            author=cls.user, text='Новый двигатель для машины')
+        cls.trucks = Post.objects.create(
+            author=cls.user, text='Старый двигатель для грузовика')
+
+    def setUp(self):
+        index_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, index_dir, ignore_errors=True)
+        settings_override = override_settings(
+            RELATED_POSTS_INDEX=os.path.join(index_dir, 'related.npz'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def related(self, post):
+        return list(RelatedPost.objects.filter(post=post)
+                    .values_list('related', flat=True))
+
+    def test_build_finds_similar_texts(self):
+        """Похожими считаются посты с общими словами, но не сам пост."""
+        call_command('build_related_posts', stdout=StringIO())
+        self.assertEqual(self.related(self.cats), [self.kittens.pk])
+        self.assertEqual(self.related(self.cars), [self.trucks.pk])
+
+    def test_neighbours_computed_outside_transaction(self):
+        """Похожие посты считаются до транзакции, которая заменяет
+        связи."""
+        wrapper, depths = track_atomic_depth(TfidfIndex.neighbours)
+        with mock.patch.object(TfidfIndex, 'neighbours', wrapper):
+            call_command('build_related_posts', stdout=StringIO())
+        self.assertTrue(depths)
+        self.assertEqual(set(depths), {len(connection.savepoint_ids)})
+
+    def test_incremental_updates_affected_lists(self):
+        """Инкрементальный запуск векторизует новые и изменённые посты,
+        пересчитывает списки, где стоял изменённый пост, и дополняет
+        остальные новыми похожими."""
+        call_command('build_related_posts', stdout=StringIO())
+        RelatedPost.objects.filter(post=self.kittens).update(score=0.9)
+        Post.objects.filter(pk=self.trucks.pk).update(
+            text='Котята любят спать')
+        new_post = Post.objects.create(
+            author=self.user, text='Кошки на солнце')
+        out = StringIO()
+        call_command('build_related_posts', '--incremental', stdout=out)
+        self.assertIn('Пересчитано постов: 3, дополнено списков: 2',
+                      out.getvalue())
+        self.assertIn(self.kittens.pk, self.related(self.trucks))
+        self.assertIn(self.cats.pk, self.related(new_post))
+        # Список машины держал старую версию грузовика.
+        self.assertEqual(self.related(self.cars), [])
+        # Неизменённые посты получили новый пост в похожие, сохранённое
+        # сходство котят с кошками не пересчитывалось.
+        self.assertIn(new_post.pk, self.related(self.cats))
+        self.assertEqual(RelatedPost.objects.get(
+            post=self.kittens, related=self.cats).score, 0.9)
+
+    def test_incremental_drops_deleted_posts(self):
+        """Списки, где стоял удалённый пост, считаются заново."""
+        call_command('build_related_posts', stdout=StringIO())
+        Post.objects.filter(pk=self.trucks.pk).delete()
+        out = StringIO()
+        call_command('build_related_posts', '--incremental', stdout=out)
+        self.assertIn('Пересчитано постов: 1', out.getvalue())
+        self.assertEqual(self.related(self.cars), [])
+
+
+class RankTrendingCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.hot = Post.objects.create(author=cls.user, text='Горячий')
+        cls.warm = Post.objects.create(author=cls.user, text='Тёплый')
+        cls.old = Post.objects.create(author=cls.user, text='Старый')
+        Post.objects.filter(pk__in=[cls.hot.pk, cls.warm.pk, cls.old.pk]
+                            ).update(pub_date=timezone.now()
+                                     - timedelta(days=30))
+        for post, age, count in ((cls.hot, timedelta(minutes=10), 2),
+                                 (cls.warm, timedelta(hours=12), 5),
+                                 (cls.old, timedelta(days=3), 10)):
+            for _ in range(count):
+                comment = Comment.objects.create(
+                    post=post, author=cls.user, text='Комментарий')
+                Comment.objects.filter(pk=comment.pk).update(
+                    created=timezone.now() - age)
+
+    def test_recent_comments_rank_higher(self):
+        """Свежие комментарии весят больше старых, а комментарии вне
+        окна не учитываются."""
+        TrendingPost.objects.create(post=self.old, rank=1, score=1,
+                                    computed=timezone.now())
+        call_command('rank_trending', stdout=StringIO())
+        self.assertEqual(
+            list(TrendingPost.objects.values_list('post', 'rank')),
+            [(self.hot.pk, 1), (self.warm.pk, 2)])
+
+
+class RebuildGroupStatsCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Пост {i}', group=cls.group)
+            for i in range(3)
+        ])
+
+    def test_rebuild_counts_bulk_created_posts(self):
+        """Полный пересчёт учитывает посты, созданные без сигналов."""
+        self.assertFalse(GroupStats.objects.exists())
+        call_command('rebuild_group_stats', stdout=StringIO())
+        stats = GroupStats.objects.get(group=self.group)
+        self.assertEqual(stats.posts_count, 3)
+        self.assertEqual(
+            GroupActivity.objects.get(group=self.group).posts_count, 3)
+
+    def test_migration_fills_group_stats(self):
+        """Миграция сводок учитывает уже существующие посты."""
+        run_data_migration('0013_group_stats', 'fill_group_stats')
+        self.assertEqual(
+            GroupStats.objects.get(group=self.group).posts_count, 3)
+        self.assertEqual(
+            GroupActivity.objects.get(group=self.group).posts_count, 3)
+
+    def test_rebuild_date_buckets(self):
+        """Корзины архива пересчитываются для сайта и для автора."""
+        call_command('rebuild_date_buckets', stdout=StringIO())
+        self.assertEqual(
+            list(DateBucket.objects.order_by('scope').values_list(
+                'scope', 'scope_id', 'posts_count')),
+            [(DateBucket.AUTHOR, self.user.pk, 3), (DateBucket.SITE, 0, 3)])
+
+    def test_migration_fills_date_buckets(self):
+        """Миграция корзин архива учитывает уже существующие посты."""
+        run_data_migration('0014_datebucket', 'fill_date_buckets')
+        self.assertEqual(
+            list(DateBucket.objects.order_by('scope').values_list(
+                'scope', 'scope_id', 'posts_count')),
+            [(DateBucket.AUTHOR, self.user.pk, 3), (DateBucket.SITE, 0, 3)])
+
+
+class BuildImageVariantsCommandTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_backfills_missing_variants(self):
+        """Команда нарезает варианты и заполняет размеры только для
+        постов с картинкой."""
+        user = User.objects.create_user(username='auth')
+        buffer = BytesIO()
+        Image.new('RGB', (500, 200)).save(buffer, 'PNG')
+        post = Post.objects.create(
+            author=user, text='Пост',
+            image=SimpleUploadedFile('old.png', buffer.getvalue()))
+        Post.objects.create(author=user, text='Без картинки')
+        out = StringIO()
+        call_command('build_image_variants', stdout=out)
+        self.assertIn('Обработано картинок: 1', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual([width for width, _, _ in post.variants['webp']],
+                         [320])
+        self.assertEqual((post.image_width, post.image_height), (500, 200))
+        self.assertTrue(post.image_placeholder)
+
+
+class HashMediaCommandTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_moves_files_to_hashed_names(self):
+        """Старые картинки переезжают на имена по содержимому, прежние
+        файлы затем удаляет gc_media."""
+        FileSystemStorage().save('posts/plain.png', ContentFile(b'image'))
+        post = Post.objects.create(
+            author=User.objects.create_user(username='auth'),
+            text='Пост', image='posts/plain.png')
+        call_command('hash_media', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertRegex(post.image.name, r'^posts/\w\w/\w\w/\w{64}\.png$')
+        call_command('gc_media', '--grace', '0', stdout=StringIO())
+        self.assertFalse(default_storage.exists('posts/plain.png'))
+        self.assertTrue(default_storage.exists(post.image.name))
+
+
+class GcMediaCommandTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        buffer = BytesIO()
+        Image.new('RGB', (300, 200)).save(buffer, 'PNG')
+        self.post = Post.objects.create(
+            author=User.objects.create_user(username='auth'), text='Пост',
+            image=SimpleUploadedFile('gc.png', buffer.getvalue()))
+        self.thumbnail = get_thumbnail(self.post.image, '600x600',
+                                       upscale=False)
+
+    def test_dry_run_keeps_files(self):
+        """С --dry-run команда только считает осиротевшие файлы."""
+        self.post.delete()
+        out = StringIO()
+        call_command('gc_media', '--grace', '0', '--dry-run', stdout=out)
+        self.assertIn('Будет удалено: исходников в кеше миниатюр 1, '
+                      'миниатюр 1, файлов 1', out.getvalue())
+        self.assertTrue(default_storage.exists(self.thumbnail.name))
+        self.assertTrue(default_storage.exists(self.post.image.name))
+
+    def test_removes_thumbnails_of_deleted_images(self):
+        """Миниатюры удалённой картинки уходят вместе с записями sorl,
+        миниатюры живых постов остаются."""
+        call_command('gc_media', '--grace', '0', stdout=StringIO())
+        self.assertTrue(default_storage.exists(self.thumbnail.name))
+        self.post.delete()
+        call_command('gc_media', '--grace', '0', stdout=StringIO())
+        self.assertFalse(default_storage.exists(self.thumbnail.name))
+        self.assertFalse(default_storage.exists(self.post.image.name))
+        self.assertFalse(KVStore.objects.exists())
+
+    def test_external_sort_merges_runs(self):
+        """Внешняя сортировка сливает куски, не уместившиеся в память,
+        а разность пропускает повторы."""
+        names = iter(['d', 'b', 'e', 'a', 'c', 'b'])
+        merged = list(external_sorted(names, run_size=2))
+        self.assertEqual(merged, ['a', 'b', 'b', 'c', 'd', 'e'])
+        self.assertEqual(
+            list(sorted_difference(merged, ['b', 'd'])), ['a', 'c', 'e'])
+
+
+class BenchFollowFeedCommandTests(TestCase):
+    def test_shared_cache_untouched(self):
+        """Замер чистит только свой кеш, а не общий из настроек."""
+        cache.set('pending_views', 3, None)
+        out = StringIO()
+        call_command('bench_follow_feed', '--follows', '3', '--repeat', '1',
+                     stdout=out)
+        self.assertIn('merge', out.getvalue())
+        self.assertEqual(cache.get('pending_views'), 3)
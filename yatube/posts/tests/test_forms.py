@@ -1,13 +1,20 @@
 import shutil
 import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
 from ..forms import PostForm, CommentForm
+from ..images import process_post_image
 from ..models import Post, Group, Comment, User
+from ..templatetags.post_images import post_picture
 from django.conf import settings
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 import datetime as dt
+from django.core.files.storage import default_storage
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -214,3 +221,190 @@ class PostFormTests(TestCase):
             ).exists()
         )
         self.assertIn(PostFormTests.comment, response.context['comments'])
+
+
+def make_image(name, size, fmt='PNG', color=(200, 30, 30)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=color).save(buffer, fmt)
+    return SimpleUploadedFile(name=name, content=buffer.getvalue(),
+                              content_type=f'image/{fmt.lower()}')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageVariantsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def test_upload_builds_variants(self):
+        """При загрузке картинка нарезается по ширинам в WebP и JPEG,
+        а страница поста отдаёт <picture> со srcset."""
+        self.author_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': make_image('wide.png', (1200, 600)),
+        })
+        post = Post.objects.get(text='Пост с картинкой')
+        variants = post.variants
+        self.assertEqual([width for width, _, _ in variants['jpeg']],
+                         [320, 640, 960])
+        self.assertEqual(variants['webp'][-1][:2], [960, 339])
+        self.assertEqual((post.image_width, post.image_height), (1200, 600))
+        self.assertTrue(post.image_placeholder.startswith(
+            'data:image/jpeg;base64,'))
+        for _, _, name in variants['webp'] + variants['jpeg']:
+            self.assertTrue(default_storage.exists(name))
+        response = self.author_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, variants['jpeg'][0][2])
+
+    def test_replaced_variants_collected_by_gc(self):
+        """Прежние варианты после замены картинки остаются до gc_media,
+        а затем удаляются."""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   image=make_image('old.png', (400, 400)))
+        process_post_image(post)
+        old_names = [post.image.name] + [
+            name for _, _, name in post.variants['jpeg']]
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Пост', 'image': make_image(
+                'new.png', (700, 700), color=(30, 200, 30))})
+        post.refresh_from_db()
+        self.assertEqual([width for width, _, _ in post.variants['jpeg']],
+                         [320, 640])
+        self.assertTrue(all(default_storage.exists(name)
+                            for name in old_names))
+        call_command('gc_media', '--grace', '0', stdout=StringIO())
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(post.image.name))
+        for _, _, name in post.variants['webp']:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_identical_uploads_share_files(self):
+        """Одинаковые картинки хранятся одним файлом с общими
+        вариантами."""
+        for text in ('Первый', 'Второй'):
+            self.author_client.post(reverse('posts:post_create'), data={
+                'text': text,
+                'image': make_image(f'{text}.png', (640, 640)),
+            })
+        first, second = Post.objects.order_by('pk')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.variants, second.variants)
+
+    def test_fallback_thumbnail_uses_stored_size(self):
+        """Без вариантов миниатюра sorl не больше исходника, размеры
+        которого сохранены в посте."""
+        post = Post(author=self.user, text='Пост', image='posts/old.png',
+                    image_width=500, image_height=200)
+        context = post_picture(post)
+        self.assertEqual((context['width'], context['height']), (500, 177))
+        self.assertEqual(context['geometry'], '500x177')
+        post.image_width = post.image_height = None
+        self.assertEqual(post_picture(post)['geometry'], '960x339')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_large_jpeg_is_downscaled_and_stripped(self):
+        """Большой JPEG уменьшается, поворачивается по EXIF и
+        сохраняется без EXIF."""
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new('RGB', (3000, 1000), color=(10, 120, 200)).save(
+            buffer, 'JPEG', exif=exif.tobytes())
+        upload = SimpleUploadedFile('photo.jpeg', buffer.getvalue(),
+                                    content_type='image/jpeg')
+        form = PostForm(data={'text': 'Пост'}, files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        post = form.save(commit=False)
+        post.author = self.user
+        post.save()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with post.image.open('rb') as file:
+            stored = Image.open(file)
+            self.assertEqual(stored.size, (853, 2560))
+            self.assertFalse(stored.getexif())
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка с чрезмерным числом пикселей отклоняется по
+        заголовку."""
+        with mock.patch('posts.uploads.MAX_IMAGE_PIXELS', 100):
+            form = PostForm(data={'text': 'Пост'},
+                            files={'image': make_image('big.png', (20, 20))})
+            self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def save_upload(self, upload):
+        form = PostForm(data={'text': 'Пост'}, files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        post = form.save(commit=False)
+        post.author = self.user
+        post.save()
+        return post
+
+    def test_other_formats_converted(self):
+        """TIFF с EXIF пересохраняется в JPEG без EXIF, статичный GIF
+        с палитрой — в PNG."""
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        Image.new('RGB', (3000, 100)).save(buffer, 'TIFF',
+                                           exif=exif.tobytes())
+        post = self.save_upload(SimpleUploadedFile(
+            'scan.tiff', buffer.getvalue(), content_type='image/tiff'))
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with post.image.open('rb') as file:
+            stored = Image.open(file)
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.width, 2560)
+            self.assertFalse(stored.getexif())
+        buffer = BytesIO()
+        Image.new('P', (40, 40)).save(buffer, 'GIF')
+        post = self.save_upload(SimpleUploadedFile(
+            'icon.gif', buffer.getvalue(), content_type='image/gif'))
+        self.assertTrue(post.image.name.endswith('.png'))
+
+    def test_animation_kept_or_rejected(self):
+        """Анимация в пределах размеров сохраняется как есть, большая
+        отклоняется."""
+        buffer = BytesIO()
+        frames = [Image.new('RGB', (60, 30), color)
+                  for color in ('red', 'blue')]
+        frames[0].save(buffer, 'GIF', save_all=True,
+                       append_images=frames[1:])
+        content = buffer.getvalue()
+        post = self.save_upload(SimpleUploadedFile(
+            'anim.gif', content, content_type='image/gif'))
+        with post.image.open('rb') as file:
+            self.assertEqual(file.read(), content)
+        with mock.patch('posts.uploads.MAX_STORED_SIDE', 50):
+            form = PostForm(data={'text': 'Пост'}, files={
+                'image': SimpleUploadedFile('anim.gif', content,
+                                            content_type='image/gif')})
+            self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
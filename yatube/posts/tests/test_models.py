@@ -1,5 +1,6 @@
 from django.test import TestCase
-from ..models import Group, Post, User
+from django.utils import timezone
+from ..models import Group, GroupActivity, GroupStats, Post, User
 
 STRING_LEN = 15
 
@@ -26,3 +27,72 @@ class PostModelTest(TestCase):
                          'Тестовый пост более 15 символов'[:STRING_LEN])
         group = PostModelTest.group
         self.assertEqual(str(group), 'Тестовая группа')
+
+
+class GroupStatsSignalTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(title='Первая', slug='first',
+                                         description='Описание')
+        cls.other = Group.objects.create(title='Вторая', slug='second',
+                                         description='Описание')
+
+    def counts(self, group):
+        stats = GroupStats.objects.filter(group=group).first()
+        activity = GroupActivity.objects.filter(
+            group=group, day=timezone.localdate()).first()
+        return (stats.posts_count if stats else 0,
+                activity.posts_count if activity else 0)
+
+    def test_rollups_follow_post_changes(self):
+        """Создание, перенос и удаление поста сдвигают сводки групп."""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.group)
+        Post.objects.create(author=self.user, text='Второй пост',
+                            group=self.group)
+        self.assertEqual(self.counts(self.group), (2, 2))
+        self.assertEqual(GroupStats.objects.get(group=self.group)
+                         .last_post_at,
+                         Post.objects.filter(group=self.group)
+                         .latest('pub_date').pub_date)
+        post.group = self.other
+        post.save()
+        self.assertEqual(self.counts(self.group), (1, 1))
+        self.assertEqual(self.counts(self.other), (1, 1))
+        post.delete()
+        self.assertEqual(self.counts(self.other), (0, 0))
+        self.assertIsNone(GroupStats.objects.get(group=self.other)
+                          .last_post_at)
+
+
+class PostImageSignalTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_replaced_image_resets_variants(self):
+        """Замена картинки в обход представлений сбрасывает варианты,
+        размеры и заглушку прежней, а сохранение без замены их
+        не трогает."""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   image='posts/old.png')
+        Post.objects.filter(pk=post.pk).update(
+            image_variants='{"jpeg": [[320, 113, "posts/variants/a.jpg"]]}',
+            image_width=640, image_height=226,
+            image_placeholder='data:image/jpeg;base64,AA==')
+        post.refresh_from_db()
+        post.text = 'Новый текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertTrue(post.variants)
+        self.assertEqual(post.image_width, 640)
+        post.image = 'posts/new.png'
+        post.save()
+        self.assertEqual(post.variants, {})
+        post.refresh_from_db()
+        self.assertEqual(
+            (post.image_variants, post.image_width, post.image_height,
+             post.image_placeholder), ('', None, None, ''))
@@ -1,16 +1,28 @@
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
 from django.test import TestCase, Client, override_settings
-from ..models import Group, Post, Follow, User
+from django.utils import timezone
+from ..models import (Group, Post, Follow, Like, Recommendation, RelatedPost,
+                      TrendingPost, User)
 from django.urls import reverse
 from django import forms
+import json
 import tempfile
 import shutil
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from ..counters import likes_counter, views_counter
+from ..idsets import following_authors
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 POSTS_PER_PAGE = 10
+FOLLOWS_PER_PAGE = 50
 POSTS_NUM = 15
 
 
@@ -207,3 +219,674 @@ class PostViewTests(TestCase):
             author__following__user=PostViewTests.user).count()
         self.assertEqual(author_count, author_count_new)
         self.assertNotEqual(follower_count, follower_count_new)
+
+
+class SitemapViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def get_section(self, name):
+        response = self.guest_client.get(reverse(
+            'posts:sitemap_section', kwargs={'section': name, 'page': 1}))
+        return b''.join(response.streaming_content).decode()
+
+    @override_settings(SITE_URL='https://yatube.example')
+    def test_sitemap_ignores_host_header(self):
+        """Адреса в карте сайта строятся от SITE_URL, а не от Host."""
+        content = self.guest_client.get(
+            reverse('posts:sitemap_index'),
+            HTTP_HOST='evil.example').content.decode()
+        self.assertIn('https://yatube.example/sitemap-posts-1.xml', content)
+        self.assertNotIn('evil.example', content)
+        response = self.guest_client.get(
+            reverse('posts:sitemap_section',
+                    kwargs={'section': 'posts', 'page': 1}),
+            HTTP_HOST='evil.example')
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('https://yatube.example/posts/', content)
+        self.assertNotIn('evil.example', content)
+
+    def test_sitemap_index_lists_sections(self):
+        """Индекс карты сайта ссылается на все разделы."""
+        content = self.guest_client.get(
+            reverse('posts:sitemap_index')).content.decode()
+        for name in ('posts', 'profiles', 'groups'):
+            with self.subTest(name=name):
+                self.assertIn(reverse('posts:sitemap_section',
+                                      kwargs={'section': name, 'page': 1}),
+                              content)
+
+    def test_sitemap_sections_content(self):
+        expected = {
+            'posts': reverse('posts:post_detail',
+                             kwargs={'post_id': self.post.pk}),
+            'profiles': reverse('posts:profile',
+                                kwargs={'username': self.user.username}),
+            'groups': reverse('posts:group_list',
+                              kwargs={'slug': self.group.slug}),
+        }
+        for name, url in expected.items():
+            with self.subTest(name=name):
+                self.assertIn(url, self.get_section(name))
+
+    def test_sitemap_section_cache_invalidation(self):
+        """Раздел берётся из кеша, пока не изменится набор id."""
+        self.get_section('posts')
+        with self.assertNumQueries(2):
+            self.get_section('posts')
+        new_post = Post.objects.create(author=self.user, text='Новый пост')
+        self.assertIn(reverse('posts:post_detail',
+                              kwargs={'post_id': new_post.pk}),
+                      self.get_section('posts'))
+
+    def test_sitemap_unknown_section(self):
+        response = self.guest_client.get(reverse(
+            'posts:sitemap_section', kwargs={'section': 'posts', 'page': 99}))
+        self.assertEqual(response.status_code, 404)
+
+
+class FeedViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост для ленты',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_feeds_contain_posts(self):
+        """RSS и Atom ленты содержат пост."""
+        reverse_names = (
+            reverse('posts:index_rss'),
+            reverse('posts:index_atom'),
+            reverse('posts:group_rss', kwargs={'slug': self.group.slug}),
+            reverse('posts:group_atom', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile_rss',
+                    kwargs={'username': self.user.username}),
+            reverse('posts:profile_atom',
+                    kwargs={'username': self.user.username}),
+        )
+        post_url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.pk})
+        for reverse_name in reverse_names:
+            with self.subTest(reverse_name=reverse_name):
+                response = self.guest_client.get(reverse_name)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(post_url, response.content.decode())
+
+    def test_feed_conditional_get(self):
+        """Повторный запрос с If-Modified-Since получает 304."""
+        url = reverse('posts:group_rss', kwargs={'slug': self.group.slug})
+        response = self.guest_client.get(url)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_feed_changes_after_edit_and_delete(self):
+        """Правка и удаление поста меняют ETag и закешированный XML."""
+        url = reverse('posts:group_rss', kwargs={'slug': self.group.slug})
+        extra = Post.objects.create(author=self.user, text='Лишний пост',
+                                    group=self.group)
+        etag = self.guest_client.get(url)['ETag']
+        self.assertEqual(self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Исправленный пост', response.content.decode())
+        etag = response['ETag']
+        extra.delete()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Лишний пост', response.content.decode())
+
+    @override_settings(SITE_URL='https://yatube.example')
+    def test_feed_ignores_host_header(self):
+        """Ссылки ленты строятся от SITE_URL, а не от Host."""
+        content = self.guest_client.get(
+            reverse('posts:index_atom'),
+            HTTP_HOST='evil.example').content.decode()
+        self.assertIn('https://yatube.example/posts/', content)
+        self.assertIn('https://yatube.example/feeds/atom/', content)
+        self.assertNotIn('evil.example', content)
+
+    def test_feed_unknown_group(self):
+        response = self.guest_client.get(
+            reverse('posts:group_rss', kwargs={'slug': 'unknown'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class ViewCounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_views_are_buffered_and_flushed(self):
+        """Просмотры копятся в кеше и сбрасываются одним UPDATE."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        for _ in range(3):
+            response = self.guest_client.get(url)
+        self.assertEqual(response.context['views_count'], 3)
+        # Первый запрос открыл интервал и сразу сбросил свой просмотр.
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(views_counter.flush(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 3)
+        self.assertEqual(views_counter.pending(self.post.pk), 0)
+        self.guest_client.get(url)
+        views_counter.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 4)
+
+    def test_late_log_entry_flushed(self):
+        """Строка журнала, записанная после сброса, попадает
+        в следующий сброс."""
+        views_counter.incr(views_counter.key(self.post.pk), 1)
+        seq = views_counter.incr(views_counter.key('seq'), 1)
+        self.assertEqual(views_counter.flush(), 0)
+        cache.set(views_counter.key('log', seq), self.post.pk, None)
+        self.assertEqual(views_counter.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 1)
+
+    def test_lost_log_entry_skipped(self):
+        """Потерянная строка журнала не останавливает сброс навсегда."""
+        views_counter.incr(views_counter.key('seq'), 1)
+        views_counter.flush()
+        views_counter.add(self.post.pk)
+        views_counter.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 1)
+
+    def test_entries_after_gap_wait_for_it(self):
+        """Строки после ещё не записанной остаются в журнале и уходят
+        в базу одним сбросом, когда пропуск заполнится."""
+        gap = views_counter.incr(views_counter.key('seq'), 1)
+        for i in range(3):
+            views_counter.add(Post.objects.create(
+                author=self.user, text=f'Пост {i}').pk)
+        self.assertEqual(views_counter.flush(), 0)
+        views_counter.incr(views_counter.key(self.post.pk), 1)
+        cache.set(views_counter.key('log', gap), self.post.pk, None)
+        self.assertEqual(views_counter.flush(), 4)
+        self.assertEqual(cache.get(views_counter.key('flushed')), gap + 3)
+
+    def test_evicted_counter_does_not_stop_flush(self):
+        """Вытесненный после чтения счётчик не прерывает вычитание
+        остальных."""
+        other = Post.objects.create(author=self.user, text='Другой пост')
+        views_counter.add(self.post.pk)
+        views_counter.add(other.pk)
+        decr = cache.decr
+
+        def evicted(key, delta):
+            if key == views_counter.key(self.post.pk):
+                raise ValueError(key)
+            return decr(key, delta)
+
+        with mock.patch.object(cache, 'decr', side_effect=evicted):
+            self.assertEqual(views_counter.flush(), 2)
+        self.assertEqual(views_counter.pending(other.pk), 0)
+
+
+class LikeViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create([Post(author=cls.user,
+                                       text=f'Тестовый пост номер {i}',
+                                       group=cls.group)
+                                  for i in range(POSTS_PER_PAGE)])
+        cls.post = Post.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def like(self):
+        return self.reader_client.post(
+            reverse('posts:post_like', kwargs={'post_id': self.post.pk}),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_like_toggle_json(self):
+        """Лайк ставится и снимается без редиректа, счётчик копится."""
+        self.assertEqual(self.like().json(),
+                         {'liked': True, 'likes_count': 1})
+        self.assertTrue(Like.objects.filter(
+            post=self.post, user=self.reader).exists())
+        self.assertEqual(self.like().json(),
+                         {'liked': False, 'likes_count': 0})
+        self.assertFalse(Like.objects.filter(post=self.post).exists())
+        self.like()
+        likes_counter.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_cascade_delete_uncounts_like(self):
+        """Лайк, удалённый вместе с пользователем, вычитается из
+        счётчика."""
+        reader = User.objects.create_user(username='leaving')
+        Like.objects.create(post=self.post, user=reader)
+        likes_counter.flush()
+        reader.delete()
+        likes_counter.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_negative_delta_clamped(self):
+        """Ушедшая в минус сумма приростов не ломает сброс."""
+        likes_counter.add(self.post.pk, -3)
+        likes_counter.add(Post.objects.last().pk, 1)
+        self.assertEqual(likes_counter.flush(), -2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertEqual(Post.objects.last().likes_count, 1)
+
+    def test_like_fallback_redirect(self):
+        response = self.reader_client.post(
+            reverse('posts:post_like', kwargs={'post_id': self.post.pk}))
+        self.assertRedirects(response, reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}))
+
+    def test_liked_state_single_lookup(self):
+        """Отметки лайков на странице группы не требуют запроса на пост."""
+        self.like()
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.reader_client.get(url)
+        Like.objects.create(post=Post.objects.last(), user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(url)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'posts_like' in query['sql']])
+        liked = [post.is_liked for post in response.context['page_obj']]
+        self.assertEqual(liked.count(True), 1)
+        self.assertTrue(response.context['page_obj'][0].is_liked)
+
+
+class FollowCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.profile_url = reverse('posts:profile',
+                                   kwargs={'username': self.author.username})
+
+    def test_follow_state_from_cache(self):
+        """Состояние подписки в профиле читается из кеша подписок."""
+        self.assertFalse(
+            self.reader_client.get(self.profile_url).context['following'])
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(self.profile_url)
+        self.assertTrue(response.context['following'])
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'posts_follow' in query['sql']])
+        self.assertIn(self.author.pk, following_authors.get(self.reader.pk))
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        self.assertFalse(
+            self.reader_client.get(self.profile_url).context['following'])
+
+
+class FollowApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def post(self, name, username=None):
+        return self.reader_client.post(reverse(
+            name, kwargs={'username': username or self.author.username}))
+
+    def test_follow_unfollow_idempotent(self):
+        """Повторные запросы не меняют состояние и счётчик подписчиков."""
+        for _ in range(2):
+            self.assertEqual(self.post('posts:api_follow').json(),
+                             {'following': True, 'followers_count': 1})
+        self.assertEqual(Follow.objects.filter(author=self.author).count(), 1)
+        for _ in range(2):
+            self.assertEqual(self.post('posts:api_unfollow').json(),
+                             {'following': False, 'followers_count': 0})
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_api_self_and_get(self):
+        response = self.post('posts:api_follow', self.reader.username)
+        self.assertEqual(response.json(),
+                         {'following': False, 'followers_count': 0})
+        response = self.reader_client.get(reverse(
+            'posts:api_follow', kwargs={'username': self.author.username}))
+        self.assertEqual(response.status_code, 405)
+
+
+class FollowListViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        User.objects.bulk_create([User(username=f'reader{i}')
+                                  for i in range(FOLLOWS_PER_PAGE + 5)])
+        Follow.objects.bulk_create([
+            Follow(author=cls.author, user=user)
+            for user in User.objects.filter(username__startswith='reader')
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_followers_keyset_pages(self):
+        """Подписчики листаются по ключу id без пропусков и повторов."""
+        url = reverse('posts:profile_followers',
+                      kwargs={'username': self.author.username})
+        response = self.guest_client.get(url)
+        first_page = response.context['users']
+        self.assertEqual(len(first_page), FOLLOWS_PER_PAGE)
+        self.assertEqual(response.context['followers_count'],
+                         FOLLOWS_PER_PAGE + 5)
+        response = self.guest_client.get(
+            url, {'before': response.context['next_before']})
+        second_page = response.context['users']
+        self.assertEqual(len(second_page), 5)
+        self.assertIsNone(response.context['next_before'])
+        self.assertFalse(set(first_page) & set(second_page))
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Слишком длинный или нецифровой курсор даёт первую страницу."""
+        url = reverse('posts:profile_followers',
+                      kwargs={'username': self.author.username})
+        for before in ('9' * 30, '²', 'abc'):
+            with self.subTest(before=before):
+                response = self.guest_client.get(url, {'before': before})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['users']),
+                                 FOLLOWS_PER_PAGE)
+
+    def test_following_page(self):
+        reader = User.objects.get(username='reader0')
+        response = self.guest_client.get(reverse(
+            'posts:profile_following', kwargs={'username': reader.username}))
+        self.assertEqual(response.context['users'], [self.author])
+        self.assertEqual(response.context['following_count'], 1)
+
+    def test_bulk_follow_api(self):
+        reader = User.objects.get(username='reader0')
+        client = Client()
+        client.force_login(self.author)
+        response = client.post(
+            reverse('posts:api_bulk_follow'),
+            data=json.dumps({'usernames': ['reader0', 'reader1', 'auth']}),
+            content_type='application/json')
+        self.assertEqual(response.json(), {'following_count': 2})
+        self.assertTrue(Follow.objects.filter(
+            author=reader, user=self.author).exists())
+
+
+@override_settings(FOLLOW_FEED_ENGINE='merge')
+class MergedFollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{i}')
+                       for i in range(3)]
+        for author in cls.authors:
+            Follow.objects.create(author=author, user=cls.reader)
+        for i in range(POSTS_NUM):
+            Post.objects.create(author=cls.authors[i % 3],
+                                text=f'Тестовый пост номер {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_page(self, page=1):
+        response = self.reader_client.get(reverse('posts:follow_index'),
+                                          {'page': page})
+        return response.context['page_obj']
+
+    def test_merge_matches_join(self):
+        """Слияние списков авторов даёт ту же ленту, что и JOIN."""
+        expected = list(Post.objects.filter(
+            author__following__user=self.reader))
+        first_page = self.get_page(1)
+        self.assertEqual(first_page.paginator.count, POSTS_NUM)
+        self.assertEqual(list(first_page) + list(self.get_page(2)), expected)
+
+    def test_merge_follows_new_and_deleted_posts(self):
+        self.get_page()
+        new_post = Post.objects.create(author=self.authors[0],
+                                       text='Новый пост')
+        self.assertEqual(self.get_page()[0], new_post)
+        new_post.delete()
+        self.assertNotIn(new_post, list(self.get_page()))
+        self.assertEqual(self.get_page().paginator.count, POSTS_NUM)
+
+
+class RecommendationPanelTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.followed = User.objects.create_user(username='followed')
+        cls.suggested = User.objects.create_user(username='suggested')
+        Recommendation.objects.create(user=cls.user, author=cls.followed,
+                                      score=2)
+        Recommendation.objects.create(user=cls.user, author=cls.suggested,
+                                      score=1)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_panel_skips_already_followed(self):
+        """Панель рекомендаций не показывает авторов, на которых
+        пользователь подписался после пересчёта."""
+        Follow.objects.create(user=self.user, author=self.followed)
+        for url in (reverse('posts:follow_index'),
+                    reverse('posts:profile',
+                            kwargs={'username': self.user.username})):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.context['recommended_authors'],
+                                 [self.suggested])
+
+
+class RelatedPostsViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Первый пост')
+        cls.related = Post.objects.create(author=cls.user, text='Второй пост')
+        RelatedPost.objects.create(post=cls.post, related=cls.related,
+                                   score=0.5)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_related_posts(self):
+        """Похожие записи читаются одним запросом вместе с авторами."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        related_queries = [query for query in queries.captured_queries
+                           if 'posts_relatedpost' in query['sql']]
+        self.assertEqual(len(related_queries), 1)
+        self.assertContains(response, self.related.text)
+
+
+class TrendingViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.first = Post.objects.create(author=cls.user, text='Первый')
+        cls.second = Post.objects.create(author=cls.user, text='Второй')
+        TrendingPost.objects.create(post=cls.second, rank=1, score=2,
+                                    computed=cls.second.pub_date)
+        TrendingPost.objects.create(post=cls.first, rank=2, score=1,
+                                    computed=cls.second.pub_date)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_trending_reads_snapshot(self):
+        """Страница популярного идёт по снимку и не агрегирует
+        комментарии."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:trending'))
+        self.assertEqual([item.post for item in response.context['page_obj']],
+                         [self.second, self.first])
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'posts_comment' in query['sql']])
+
+
+class GroupDirectoryViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.busy = Group.objects.create(title='Активная', slug='busy',
+                                        description='Описание')
+        cls.quiet = Group.objects.create(title='Тихая', slug='quiet',
+                                         description='Описание')
+        for i in range(2):
+            Post.objects.create(author=cls.user, text=f'Пост {i}',
+                                group=cls.busy)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_directory_reads_rollups(self):
+        """Каталог сообществ показывает сводки и не группирует посты."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:group_directory'))
+        groups = list(response.context['page_obj'])
+        self.assertEqual(groups, [self.busy, self.quiet])
+        self.assertEqual([(group.posts_count, group.recent_posts)
+                          for group in groups], [(2, 2), (0, 0)])
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'posts_post' in query['sql']])
+
+
+class ArchiveViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.october = Post.objects.create(author=cls.user, text='Октябрь',
+                                          group=cls.group)
+        cls.november = Post.objects.create(author=cls.user, text='Ноябрь')
+        Post.objects.filter(pk=cls.october.pk).update(
+            pub_date=datetime(2026, 10, 5, 12, tzinfo=timezone.utc))
+        Post.objects.filter(pk=cls.november.pk).update(
+            pub_date=datetime(2026, 11, 1, 0, 30, tzinfo=timezone.utc))
+        call_command('rebuild_date_buckets', stdout=StringIO())
+        call_command('rebuild_group_stats', stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_archive_levels(self):
+        """Архив отбирает посты по году, месяцу и дню во всех срезах."""
+        cases = (
+            (reverse('posts:archive', args=[2026]),
+             [self.november, self.october]),
+            (reverse('posts:archive', args=[2026, 10]), [self.october]),
+            (reverse('posts:archive', args=[2026, 11, 1]), [self.november]),
+            (reverse('posts:archive', args=[2025]), []),
+            (reverse('posts:group_archive', args=['group', 2026]),
+             [self.october]),
+            (reverse('posts:profile_archive', args=['auth', 2026, 11]),
+             [self.november]),
+        )
+        for url, expected in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(list(response.context['page_obj']),
+                                 expected)
+
+    def test_navigation_from_buckets(self):
+        """Навигация строится по корзинам, без группировки постов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:archive', args=[2026, 10]))
+        self.assertEqual([count for _, _, count in response.context['years']],
+                         [2])
+        self.assertEqual(
+            [(month, count) for _, month, count in response.context['months']],
+            [(10, 1), (11, 1)])
+        self.assertEqual([(day, count)
+                          for _, day, count in response.context['days']],
+                         [(5, 1)])
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'GROUP BY' in query['sql']])
+
+    def test_invalid_date_is_404(self):
+        """Несуществующая дата даёт 404."""
+        response = self.client.get(reverse('posts:archive',
+                                           args=[2026, 2, 30]))
+        self.assertEqual(response.status_code, 404)
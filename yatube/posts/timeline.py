@@ -0,0 +1,132 @@
+"""Лента подписок через k-way merge кешированных списков авторов.
+
+Для каждого автора в кеше лежит пара (всего постов, список не более
+RECENT_POSTS_PER_AUTHOR последних постов как (pub_date, id)). Страница
+ленты собирается слиянием этих списков через heapq и загружается
+одним in_bulk. Любой пост из первых RECENT_POSTS_PER_AUTHOR позиций
+ленты входит в первые RECENT_POSTS_PER_AUTHOR постов своего автора,
+поэтому до этой глубины слияние точное; дальше используется JOIN.
+"""
+import heapq
+from itertools import islice
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .idsets import following_authors
+from .models import Post
+
+RECENT_POSTS_PER_AUTHOR = 200
+RECENT_CACHE_TIMEOUT = 60 * 60 * 24
+LOAD_CHUNK_SIZE = 500
+
+
+def recent_key(author_id):
+    return f'recent_posts:{author_id}'
+
+
+def load_recent_many(author_ids):
+    """Читает списки авторов пачками: сначала число постов каждого,
+    затем одним запросом посты всех, у кого их не больше
+    RECENT_POSTS_PER_AUTHOR; плодовитые авторы читаются по одному
+    с LIMIT, чтобы не тянуть всю их историю."""
+    recent = {}
+    for start in range(0, len(author_ids), LOAD_CHUNK_SIZE):
+        chunk = author_ids[start:start + LOAD_CHUNK_SIZE]
+        totals = dict(Post.objects.filter(author_id__in=chunk).values_list(
+            'author_id').annotate(total=Count('id')).order_by())
+        small = [author_id for author_id in chunk
+                 if totals.get(author_id, 0) <= RECENT_POSTS_PER_AUTHOR]
+        entries = {author_id: [] for author_id in chunk}
+        rows = Post.objects.filter(author_id__in=small).values_list(
+            'author_id', 'pub_date', 'id')
+        for author_id, pub_date, pk in rows:
+            entries[author_id].append((pub_date.timestamp(), pk))
+        for author_id in chunk:
+            if author_id not in small:
+                rows = Post.objects.filter(author_id=author_id).values_list(
+                    'pub_date', 'id')[:RECENT_POSTS_PER_AUTHOR]
+                entries[author_id] = [(pub_date.timestamp(), pk)
+                                      for pub_date, pk in rows]
+            entries[author_id].sort(reverse=True)
+            recent[author_id] = (totals.get(author_id, 0), entries[author_id])
+    return recent
+
+
+def get_recent_many(author_ids):
+    """Списки авторов одним get_many, промахи дочитываются из базы."""
+    keys = {recent_key(author_id): author_id for author_id in author_ids}
+    recent = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    loaded = load_recent_many([author_id for author_id in author_ids
+                               if author_id not in recent])
+    cache.set_many({recent_key(author_id): value
+                    for author_id, value in loaded.items()},
+                   RECENT_CACHE_TIMEOUT)
+    recent.update(loaded)
+    return recent
+
+
+def push_recent(post):
+    key = recent_key(post.author_id)
+    value = cache.get(key)
+    if value is None:
+        return
+    total, entries = value
+    entries.append((post.pub_date.timestamp(), post.pk))
+    entries.sort(reverse=True)
+    cache.set(key, (total + 1, entries[:RECENT_POSTS_PER_AUTHOR]),
+              RECENT_CACHE_TIMEOUT)
+
+
+def drop_recent(post):
+    key = recent_key(post.author_id)
+    value = cache.get(key)
+    if value is None:
+        return
+    total, entries = value
+    entries = [entry for entry in entries if entry[1] != post.pk]
+    if len(entries) < min(total - 1, RECENT_POSTS_PER_AUTHOR):
+        # Из обрезанного списка ушёл пост, и замену знает только база.
+        cache.delete(key)
+        return
+    cache.set(key, (total - 1, entries), RECENT_CACHE_TIMEOUT)
+
+
+def invalidate_recent(author_ids):
+    cache.delete_many([recent_key(author_id) for author_id in author_ids])
+
+
+def join_feed(user):
+    return Post.objects.filter(author__following__user=user).all()
+
+
+class MergedTimeline:
+    """Лента подписок для Paginator: count() без запросов к базе,
+    срезы в пределах RECENT_POSTS_PER_AUTHOR собираются слиянием."""
+
+    def __init__(self, user):
+        self.user = user
+        self.recent = get_recent_many(list(following_authors.get(user.pk)))
+
+    def count(self):
+        return sum(total for total, _ in self.recent.values())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        start = index.start or 0
+        stop = index.stop
+        if stop > RECENT_POSTS_PER_AUTHOR:
+            return list(join_feed(self.user)[start:stop])
+        merged = heapq.merge(
+            *(entries for _, entries in self.recent.values()), reverse=True)
+        ids = [pk for _, pk in islice(merged, start, stop)]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def follow_feed(user, engine):
+    if engine == 'merge':
+        return MergedTimeline(user)
+    return join_feed(user)
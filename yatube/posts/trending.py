@@ -0,0 +1,84 @@
+"""Рейтинг популярных постов.
+
+Вес складывается из скорости комментирования в нескольких окнах
+(свежие окна весят больше — это ступенчатое затухание) и из лайков
+и просмотров, затухающих с возрастом поста. Комментарии считаются
+одним агрегирующим запросом по индексу Comment.created, поэтому
+кандидаты — только посты, опубликованные или комментированные
+в самом широком окне.
+"""
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Comment, Post, TrendingPost
+
+# (окно, вес): комментарий за последний час весит больше суточного.
+WINDOWS = (
+    (timedelta(hours=1), 4.0),
+    (timedelta(hours=6), 2.0),
+    (timedelta(days=1), 1.0),
+)
+LIKE_WEIGHT = 1.0
+VIEW_WEIGHT = 0.5
+# Показатель затухания лайков и просмотров по возрасту, как в HN.
+GRAVITY = 1.5
+TRENDING_SIZE = 100
+
+
+def comment_velocity(now):
+    """{post_id: взвешенная скорость комментирования} по всем окнам."""
+    since = now - WINDOWS[-1][0]
+    windows = {
+        f'window_{i}': Count('id', filter=Q(created__gte=now - window))
+        for i, (window, _) in enumerate(WINDOWS)
+    }
+    rows = (Comment.objects.filter(created__gte=since)
+            .order_by().values('post').annotate(**windows))
+    velocity = {}
+    for row in rows:
+        velocity[row['post']] = sum(
+            weight * row[f'window_{i}'] / (window.total_seconds() / 3600)
+            for i, (window, weight) in enumerate(WINDOWS)
+        )
+    return velocity
+
+
+def score_posts(now):
+    """Список (score, post_id) кандидатов по убыванию веса."""
+    since = now - WINDOWS[-1][0]
+    velocity = comment_velocity(now)
+    commented = Comment.objects.filter(created__gte=since).values('post')
+    candidates = (Post.objects.filter(Q(pub_date__gte=since)
+                                      | Q(pk__in=commented))
+                  .order_by()
+                  .values_list('id', 'pub_date', 'likes_count',
+                               'views_count'))
+    scores = []
+    for post_id, pub_date, likes, views in candidates.iterator():
+        age = max((now - pub_date).total_seconds() / 3600, 0)
+        engagement = ((LIKE_WEIGHT * likes
+                       + VIEW_WEIGHT * math.log1p(views))
+                      / (age + 2) ** GRAVITY)
+        score = velocity.get(post_id, 0) + engagement
+        if score > 0:
+            scores.append((score, post_id))
+    scores.sort(reverse=True)
+    return scores
+
+
+def rank_trending(now=None, size=TRENDING_SIZE):
+    """Заменяет снимок популярного одним коротким транзакционным
+    обновлением; возвращает число мест."""
+    now = now or timezone.now()
+    ranked = [
+        TrendingPost(post_id=post_id, rank=rank, score=score, computed=now)
+        for rank, (score, post_id) in enumerate(score_posts(now)[:size], 1)
+    ]
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(ranked)
+    return len(ranked)
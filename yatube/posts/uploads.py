@@ -0,0 +1,117 @@
+"""Подготовка загруженной картинки до сохранения поста.
+
+Размеры проверяются по заголовку, без декодирования пикселей. Большие
+JPEG декодируются в draft-режиме: libjpeg сразу уменьшает картинку
+в 2–8 раз при распаковке, поэтому память на запрос ограничена размером
+уменьшенной копии, а не оригинала. Результат пересохраняется без EXIF
+с учётом ориентации и не больше MAX_STORED_SIDE по длинной стороне:
+JPEG, PNG и WebP — в свой формат, прочие (TIFF, BMP, статичный GIF
+и т. п.) — в PNG при прозрачности или палитре, иначе в JPEG.
+Анимированные GIF, PNG и WebP сохраняются как есть, если уже
+укладываются в MAX_STORED_SIDE и не несут EXIF, иначе отклоняются.
+Файл собирается во временном файле и уходит в хранилище частями.
+"""
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+
+MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+# Предел по заголовку: 25 Мп в RGBA — около 100 МБ при распаковке
+# форматов без draft-режима.
+MAX_IMAGE_PIXELS = 25_000_000
+MAX_STORED_SIDE = 2560
+# До этого размера результат держится в памяти, дальше — на диске.
+SPOOL_SIZE = 1024 * 1024
+# Форматы, которые пересохраняются в себя же.
+REENCODE = {
+    'JPEG': ('.jpg', {'quality': 88, 'optimize': True,
+                      'progressive': True}),
+    'MPO': ('.jpg', {'quality': 88, 'optimize': True,
+                     'progressive': True}),
+    'PNG': ('.png', {'optimize': True}),
+    'WEBP': ('.webp', {'quality': 88}),
+}
+# Анимацию пришлось бы пересобирать покадрово, поэтому она не
+# пересохраняется.
+ANIMATED = ('GIF', 'PNG', 'WEBP')
+PNG_MODES = ('1', 'L', 'LA', 'I', 'P', 'RGB', 'RGBA')
+
+
+def check_header(image):
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            'Слишком большое изображение: %(width)s×%(height)s.',
+            code='image_too_large',
+            params={'width': width, 'height': height},
+        )
+
+
+def check_animation(image):
+    if max(image.size) > MAX_STORED_SIDE or image.info.get('exif'):
+        raise ValidationError(
+            'Анимация должна быть не больше %(side)s пикселей по длинной '
+            'стороне и без EXIF.',
+            code='animation_not_allowed',
+            params={'side': MAX_STORED_SIDE},
+        )
+
+
+def output_format(image):
+    """Формат, в который пересохраняется неподвижная картинка."""
+    if image.format in REENCODE:
+        return image.format
+    if image.mode in ('RGBA', 'LA', 'PA', 'P') or (
+            'transparency' in image.info):
+        return 'PNG'
+    return 'JPEG'
+
+
+def fitted_size(size):
+    """Размер, вписанный в квадрат MAX_STORED_SIDE с сохранением
+    пропорций."""
+    width, height = size
+    scale = min(MAX_STORED_SIDE / max(width, height), 1)
+    return max(round(width * scale), 1), max(round(height * scale), 1)
+
+
+def prepare_image(upload):
+    """Возвращает UploadedFile, готовый к сохранению в хранилище."""
+    # Pillow нужен только при загрузке: не держим его в импорте форм.
+    from PIL import Image, ImageOps
+
+    if upload.size > MAX_UPLOAD_SIZE:
+        raise ValidationError('Файл больше %(size)s МБ.',
+                              code='file_too_large',
+                              params={'size': MAX_UPLOAD_SIZE // 2 ** 20})
+    upload.seek(0)
+    image = Image.open(upload)
+    check_header(image)
+    if image.format in ANIMATED and getattr(image, 'is_animated', False):
+        check_animation(image)
+        upload.seek(0)
+        return upload
+    fmt = output_format(image)
+    ext, options = REENCODE[fmt]
+    if image.format in ('JPEG', 'MPO'):
+        # draft уменьшает, только пока обе стороны не меньше запрошенных,
+        # поэтому просим размер с пропорциями оригинала.
+        image.draft('RGB', fitted_size(image.size))
+    image.thumbnail((MAX_STORED_SIDE, MAX_STORED_SIDE), Image.LANCZOS)
+    # Поворот после уменьшения: копия делается уже с маленькой картинки.
+    image = ImageOps.exif_transpose(image)
+    if ext == '.jpg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    elif fmt == 'PNG' and image.mode not in PNG_MODES:
+        image = image.convert('RGBA')
+
+    output = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    image.save(output, 'JPEG' if ext == '.jpg' else fmt, **options)
+    size = output.tell()
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0] + ext
+    content_type = Image.MIME.get('JPEG' if ext == '.jpg' else fmt)
+    return UploadedFile(output, name=name, content_type=content_type,
+                        size=size)
@@ -1,11 +1,13 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending, name='trending'),
+    path('group/', views.group_directory, name='group_directory'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
@@ -16,6 +18,7 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path('posts/<int:post_id>/like/', views.post_like, name='post_like'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -27,4 +30,84 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'profile/<str:username>/followers/',
+        views.profile_followers,
+        name='profile_followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        views.profile_following,
+        name='profile_following'
+    ),
+    path('api/follow/bulk/', views.api_bulk_follow, name='api_bulk_follow'),
+    path(
+        'api/profile/<str:username>/follow/',
+        views.api_follow,
+        name='api_follow'
+    ),
+    path(
+        'api/profile/<str:username>/unfollow/',
+        views.api_unfollow,
+        name='api_unfollow'
+    ),
+    path('feeds/rss/', feeds.index_rss, name='index_rss'),
+    path('feeds/atom/', feeds.index_atom, name='index_atom'),
+    path('group/<slug:slug>/rss/', feeds.group_rss, name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.group_atom, name='group_atom'),
+    path(
+        'profile/<str:username>/rss/',
+        feeds.profile_rss,
+        name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.profile_atom,
+        name='profile_atom'
+    ),
+    # Все три уровня архива носят одно имя: reverse выбирает шаблон
+    # по числу аргументов.
+    path('archive/<int:year>/', views.archive, name='archive'),
+    path('archive/<int:year>/<int:month>/', views.archive, name='archive'),
+    path(
+        'archive/<int:year>/<int:month>/<int:day>/',
+        views.archive,
+        name='archive'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/',
+        views.group_archive,
+        name='group_archive'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/<int:month>/',
+        views.group_archive,
+        name='group_archive'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/<int:month>/<int:day>/',
+        views.group_archive,
+        name='group_archive'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/',
+        views.profile_archive,
+        name='profile_archive'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/<int:month>/',
+        views.profile_archive,
+        name='profile_archive'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/<int:month>/<int:day>/',
+        views.profile_archive,
+        name='profile_archive'
+    ),
+    path('sitemap.xml', views.sitemap_index, name='sitemap_index'),
+    path(
+        'sitemap-<slug:section>-<int:page>.xml',
+        views.sitemap_section,
+        name='sitemap_section'
+    ),
 ]
@@ -0,0 +1,10 @@
+from itertools import islice
+
+
+def batched(iterable, size):
+    """Разбивает поток на списки длиной не более size."""
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
@@ -1,12 +1,64 @@
+import json
+
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
+                         JsonResponse, StreamingHttpResponse)
 from django.utils.text import Truncator
 from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from .models import Group, Post, User, Comment, Follow
+from django.views.decorators.http import require_POST
+from .models import (DateBucket, Group, GroupActivity, GroupStats, Post,
+                     User, Comment, Follow, Like, Recommendation,
+                     TrendingPost)
 from .forms import PostForm, CommentForm
+from . import sitemaps
+from .archive import navigation, period
+from .counters import likes_counter, views_counter
+from .follows import bulk_follow, followers_count
+from .groupstats import ACTIVITY_DAYS, recent_activity
+from .idsets import IdSet, following_authors, liked_posts
+from .images import process_post_image
+from .timeline import follow_feed
 
 POSTS_PER_PAGE = 10
+FOLLOWS_PER_PAGE = 50
+# Больше 18 цифр не влезает в 64-битный id: SQLite падает с OverflowError.
+MAX_CURSOR_DIGITS = 18
+GROUPS_PER_PAGE = 20
+RECOMMENDATIONS_SHOWN = 5
+RELATED_POSTS_SHOWN = 5
+BULK_FOLLOW_LIMIT = 500
 NUM_CHARS = 30
+# Время жизни закешированных лент: фрагмента главной и RSS/Atom.
+LISTING_CACHE_TIMEOUT = 20
+
+
+def annotate_likes(user, posts):
+    """Отмечает лайкнутые посты одним чтением кеша вместо exists()
+    на каждый пост и добавляет к счётчику несброшенный прирост."""
+    liked = liked_posts.get(user.pk) if user.is_authenticated else IdSet()
+    pending = likes_counter.pending_many([post.pk for post in posts])
+    for post in posts:
+        post.is_liked = post.pk in liked
+        post.likes_total = post.likes_count + pending[post.pk]
+
+
+def recommended_authors(user):
+    """Готовые рекомендации одним запросом; авторы, на которых
+    пользователь подписался после пересчёта, отбрасываются."""
+    if not user.is_authenticated:
+        return []
+    following = following_authors.get(user.pk)
+    recommendations = (Recommendation.objects.filter(user=user)
+                       .select_related('author')
+                       [:RECOMMENDATIONS_SHOWN + len(following)])
+    return [recommendation.author for recommendation in recommendations
+            if recommendation.author_id not in following
+            ][:RECOMMENDATIONS_SHOWN]
 
 
 def index(request):
@@ -16,6 +68,22 @@ def index(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
+    context = {
+        "page_obj": page_obj,
+        "cache_timeout": LISTING_CACHE_TIMEOUT,
+    }
+    return render(request, template, context)
+
+
+def trending(request):
+    """Популярное читается из готового снимка rank_trending."""
+    template = "posts/trending.html"
+    ranked = TrendingPost.objects.select_related('post__author',
+                                                 'post__group')
+    paginator = Paginator(ranked, POSTS_PER_PAGE)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    annotate_likes(request.user, [item.post for item in page_obj])
     context = {
         "page_obj": page_obj,
     }
@@ -29,9 +97,95 @@ def group_posts(request, slug):
     paginator = Paginator(posts, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    annotate_likes(request.user, page_obj)
     context = {
         "group": group,
         "page_obj": page_obj,
+        "stats": GroupStats.objects.filter(group=group).first(),
+        "recent_posts": recent_activity([group.pk])[group.pk],
+        "activity_days": ACTIVITY_DAYS,
+    }
+    return render(request, template, context)
+
+
+def render_archive(request, title, posts, day_counts, url_name, url_args,
+                   year, month=None, day=None):
+    """Общая часть архивов: отбор постов по индексу pub_date и
+    навигация по дневным корзинам."""
+    try:
+        start, end = period(year, month, day)
+    except (ValueError, OverflowError):
+        raise Http404('Нет такой даты')
+    posts = posts.filter(pub_date__gte=start, pub_date__lt=end)
+    paginator = Paginator(posts, POSTS_PER_PAGE)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    annotate_likes(request.user, page_obj)
+    years, months, days = navigation(day_counts, year, month)
+
+    def link(*parts):
+        return reverse(url_name, args=[*url_args, *parts])
+
+    context = {
+        "title": title,
+        "page_obj": page_obj,
+        "period_start": start,
+        "month": month,
+        "day": day,
+        "years": [(link(value), value, count) for value, count in years],
+        "months": [(link(year, value), value, count)
+                   for value, count in months],
+        "days": [(link(year, month, value), value, count)
+                 for value, count in days],
+    }
+    return render(request, "posts/archive.html", context)
+
+
+def archive(request, year, month=None, day=None):
+    day_counts = DateBucket.objects.filter(
+        scope=DateBucket.SITE, scope_id=0).values_list('day', 'posts_count')
+    return render_archive(request, 'Архив записей', Post.objects.all(),
+                          day_counts, 'posts:archive', [],
+                          year, month, day)
+
+
+def group_archive(request, slug, year, month=None, day=None):
+    group = get_object_or_404(Group, slug=slug)
+    day_counts = GroupActivity.objects.filter(group=group).values_list(
+        'day', 'posts_count')
+    return render_archive(request, f'Архив сообщества {group.title}',
+                          group.posts.all(), day_counts,
+                          'posts:group_archive', [group.slug],
+                          year, month, day)
+
+
+def profile_archive(request, username, year, month=None, day=None):
+    author = get_object_or_404(User, username=username)
+    day_counts = DateBucket.objects.filter(
+        scope=DateBucket.AUTHOR, scope_id=author.pk).values_list(
+        'day', 'posts_count')
+    return render_archive(request, f'Архив записей {author.username}',
+                          Post.objects.filter(author=author), day_counts,
+                          'posts:profile_archive', [author.username],
+                          year, month, day)
+
+
+def group_directory(request):
+    """Каталог сообществ; числа берутся из сводок, а не из постов."""
+    template = "posts/group_directory.html"
+    groups = Group.objects.annotate(
+        posts_count=Coalesce(F('stats__posts_count'), 0),
+        last_post_at=F('stats__last_post_at'),
+    ).order_by('-posts_count', 'title')
+    paginator = Paginator(groups, GROUPS_PER_PAGE)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    activity = recent_activity([group.pk for group in page_obj])
+    for group in page_obj:
+        group.recent_posts = activity[group.pk]
+    context = {
+        "page_obj": page_obj,
+        "activity_days": ACTIVITY_DAYS,
     }
     return render(request, template, context)
 
@@ -44,16 +198,17 @@ def profile(request, username):
     paginator = Paginator(author_posts, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
-    following = False
-    if not request.user.is_anonymous:
-        if Follow.objects.filter(author=author, user=request.user).exists():
-            following = True
+    annotate_likes(request.user, page_obj)
+    following = (request.user.is_authenticated
+                 and author.pk in following_authors.get(request.user.pk))
 
     context = {
         "page_obj": page_obj,
         "author": author,
         "author_posts_count": author_posts_count,
+        "followers_count": followers_count(author.pk),
         "following": following,
+        "recommended_authors": recommended_authors(request.user),
     }
     return render(request, template, context)
 
@@ -73,6 +228,8 @@ def add_comment(request, post_id):
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
     post = get_object_or_404(Post, id=post_id)
+    views_counter.add(post.pk)
+    annotate_likes(request.user, [post])
     truncator = Truncator(post.text).chars(NUM_CHARS)
     author_posts_count = Post.objects.filter(author=post.author).count()
     title = f"Пост {truncator}"
@@ -82,9 +239,13 @@ def post_detail(request, post_id):
         "title": title,
         "post": post,
         "author_posts_count": author_posts_count,
+        "views_count": post.views_count + views_counter.pending(post.pk),
         "form": form,
         "comments": comments,
+        "related_posts": (post.related.select_related('related__author')
+                          [:RELATED_POSTS_SHOWN]),
     }
+    views_counter.maybe_flush()
     return render(request, template, context)
 
 
@@ -98,6 +259,8 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         form.save()
+        if post.image:
+            process_post_image(post)
         return redirect('posts:profile', username=request.user)
     context = {
         'form': form,
@@ -119,6 +282,8 @@ def post_edit(request, post_id):
         post = form.save(commit=False)
         post.author = request.user
         form.save()
+        if 'image' in form.changed_data:
+            process_post_image(post)
         return redirect('posts:post_detail', post_id)
     if request.user != post.author:
         return redirect('posts:post_detail', post_id)
@@ -133,13 +298,15 @@ def post_edit(request, post_id):
 @login_required
 def follow_index(request):
     template = "posts/follow.html"
-    posts = Post.objects.filter(author__following__user=request.user).all()
+    posts = follow_feed(request.user, settings.FOLLOW_FEED_ENGINE)
     paginator = Paginator(posts, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    annotate_likes(request.user, page_obj)
 
     context = {
         "page_obj": page_obj,
+        "recommended_authors": recommended_authors(request.user),
     }
     return render(request, template, context)
 
@@ -157,3 +324,116 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(author=author, user=request.user).delete()
     return redirect('posts:follow_index')
+
+
+def follow_state(request, username, follow):
+    """Идемпотентно выставляет подписку и возвращает её состояние,
+    не рендеря ленту подписок."""
+    author = get_object_or_404(User, username=username)
+    if not follow:
+        Follow.objects.filter(author=author, user=request.user).delete()
+    elif author != request.user:
+        Follow.objects.get_or_create(author=author, user=request.user)
+    return JsonResponse({
+        'following': author.pk in following_authors.get(request.user.pk),
+        'followers_count': followers_count(author.pk),
+    })
+
+
+@login_required
+@require_POST
+def api_follow(request, username):
+    return follow_state(request, username, True)
+
+
+@login_required
+@require_POST
+def api_unfollow(request, username):
+    return follow_state(request, username, False)
+
+
+@login_required
+@require_POST
+def post_like(request, post_id):
+    post = get_object_or_404(Post, id=post_id)
+    # Счётчик и множество лайков пользователя обновляют сигналы Like.
+    like, liked = Like.objects.get_or_create(post=post, user=request.user)
+    if not liked:
+        Like.objects.filter(pk=like.pk).delete()
+    likes_count = post.likes_count + likes_counter.pending(post.pk)
+    likes_counter.maybe_flush()
+    if request.is_ajax():
+        return JsonResponse({'liked': liked, 'likes_count': likes_count})
+    return redirect('posts:post_detail', post_id)
+
+
+def follow_list(request, username, followers):
+    """Подписчики или подписки пользователя с пагинацией по ключу:
+    следующая страница начинается с id меньше последнего показанного,
+    поэтому глубина листания не влияет на стоимость запроса."""
+    template = 'posts/follow_list.html'
+    author = get_object_or_404(User, username=username)
+    if followers:
+        follows = Follow.objects.filter(author=author).select_related('user')
+    else:
+        follows = Follow.objects.filter(user=author).select_related('author')
+    before = request.GET.get('before')
+    if (before and len(before) <= MAX_CURSOR_DIGITS and before.isascii()
+            and before.isdigit()):
+        follows = follows.filter(id__lt=int(before))
+    follows = list(follows.order_by('-id')[:FOLLOWS_PER_PAGE + 1])
+    next_before = None
+    if len(follows) > FOLLOWS_PER_PAGE:
+        follows = follows[:FOLLOWS_PER_PAGE]
+        next_before = follows[-1].id
+    context = {
+        "author": author,
+        "followers": followers,
+        "users": [follow.user if followers else follow.author
+                  for follow in follows],
+        "next_before": next_before,
+        "followers_count": followers_count(author.pk),
+        "following_count": len(following_authors.get(author.pk)),
+    }
+    return render(request, template, context)
+
+
+def profile_followers(request, username):
+    return follow_list(request, username, followers=True)
+
+
+def profile_following(request, username):
+    return follow_list(request, username, followers=False)
+
+
+@login_required
+@require_POST
+def api_bulk_follow(request):
+    """Подписывает текущего пользователя на авторов из
+    {"usernames": [...]} одним bulk_create."""
+    try:
+        usernames = json.loads(request.body)['usernames']
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest('Ожидается {"usernames": [...]}')
+    if not isinstance(usernames, list) or len(usernames) > BULK_FOLLOW_LIMIT:
+        return HttpResponseBadRequest(
+            f'Нужен список не длиннее {BULK_FOLLOW_LIMIT} имён')
+    author_ids = User.objects.filter(
+        username__in=usernames).values_list('id', flat=True)
+    bulk_follow((request.user.pk, author_id) for author_id in author_ids)
+    return JsonResponse({
+        'following_count': len(following_authors.get(request.user.pk)),
+    })
+
+
+def sitemap_index(request):
+    return HttpResponse(sitemaps.render_index(settings.SITE_URL),
+                        content_type='application/xml')
+
+
+def sitemap_section(request, section, page):
+    section = sitemaps.SECTIONS.get(section)
+    if section is None or not 1 <= page <= section.num_pages():
+        raise Http404
+    return StreamingHttpResponse(section.stream(page, settings.SITE_URL),
+                                 content_type='application/xml')
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 _get_user_session_key, get_user_model,
+                                 load_backend)
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import router
+from django.utils.crypto import constant_time_compare
+
+USER_CACHE_TIMEOUT = 15 * 60
+# Хеш пароля в общий кеш не попадает: при обращении к user.password
+# он догружается из базы как отложенное поле, а для сверки сессии
+# кешируется только производный от него HMAC.
+SECRET_FIELDS = ('password',)
+
+
+def user_cache_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def dump_user(user):
+    fields = {field.attname: getattr(user, field.attname)
+              for field in user._meta.concrete_fields
+              if field.attname not in SECRET_FIELDS}
+    return {'fields': fields, 'session_hash': user.get_session_auth_hash()}
+
+
+def load_user(data):
+    """Пользователь из кеша с отложенными SECRET_FIELDS и HMAC сессии."""
+    model = get_user_model()
+    fields = data['fields']
+    names = [field.attname for field in model._meta.concrete_fields
+             if field.attname in fields]
+    user = model.from_db(router.db_for_read(model), names,
+                         [fields[name] for name in names])
+    return user, data['session_hash']
+
+
+def get_cached_user(request):
+    """То же, что django.contrib.auth.get_user, но пользователь берётся
+    из общего кеша, а в базу идёт только при промахе."""
+    try:
+        user_id = _get_user_session_key(request)
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    key = user_cache_key(user_id)
+    cached = cache.get(key)
+    if cached is None:
+        user = load_backend(backend_path).get_user(user_id)
+        if user is None:
+            return AnonymousUser()
+        cached = dump_user(user)
+        cache.set(key, cached, USER_CACHE_TIMEOUT)
+    user, user_hash = load_user(cached)
+
+    # Хеш пароля в сессии сверяется и для закешированного пользователя,
+    # поэтому смена пароля разлогинивает остальные сессии как обычно.
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(session_hash,
+                                                   user_hash)):
+        request.session.flush()
+        return AnonymousUser()
+    return user
@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..auth import user_cache_key
+
+User = get_user_model()
+
+
+class CachedAuthenticationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.create_user(username='auth', password='old-password-1')
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.get(username='auth')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('about:author')
+
+    def test_queries_per_authenticated_request(self):
+        """С тёплым кешем сессия и пользователь не стоят запросов."""
+        cache.clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'], self.user)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_user_save_invalidates_cache(self):
+        self.client.get(self.url)
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['user'].first_name, 'Новое имя')
+
+    def test_password_hash_not_cached(self):
+        """В кеш не попадает хеш пароля, но закешированный пользователь
+        проверяет пароль, догружая его из базы."""
+        response = self.client.get(self.url)
+        self.assertNotIn(self.user.password,
+                         repr(cache.get(user_cache_key(self.user.pk))))
+        user = response.context['user']
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('old-password-1'))
+
+    def test_password_change_logs_out_other_sessions(self):
+        self.client.get(self.url)
+        self.user.set_password('new-password-2')
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_logout_invalidates_cache(self):
+        self.client.get(self.url)
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
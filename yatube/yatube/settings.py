@@ -28,25 +28,52 @@ INSTALLED_APPS = [
     "sorl.thumbnail",
 ]
 
+# Админка нужна не каждому воркеру: с YATUBE_ADMIN=0 она не попадает
+# в приложения и маршруты, и воркер не импортирует admin.py всех
+# приложений при старте.
+ADMIN_ENABLED = os.environ.get('YATUBE_ADMIN', '1') != '0'
+if not ADMIN_ENABLED:
+    INSTALLED_APPS.remove("django.contrib.admin")
+
+# Канонический адрес сайта для абсолютных ссылок в картах сайта и лентах
+# RSS/Atom: заголовок Host задаёт клиент, а ALLOWED_HOSTS пускает любой.
+SITE_URL = os.environ.get('YATUBE_SITE_URL',
+                          'http://localhost:8000').rstrip('/')
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Сжимает ответы последним, после всех остальных middleware.
+    "core.middleware.CompressionMiddleware",
+    "core.middleware.RenderProfilerMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "users.middleware.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Время рендеринга шаблонов и тегов в заголовке Server-Timing
+# (core.profiler). Раскрывает имена шаблонов, поэтому только в DEBUG.
+RENDER_PROFILER = DEBUG
+
 ROOT_URLCONF = "yatube.urls"
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # Вне DEBUG шаблоны разбираются один раз за процесс; wsgi.py
+            # компилирует их заранее (core.templating).
+            "loaders": TEMPLATE_LOADERS if DEBUG else [
+                ("django.template.loaders.cached.Loader", TEMPLATE_LOADERS),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -99,10 +126,30 @@ USE_TZ = True
 STATIC_URL = "/static/"
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, "static"),)
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+if not DEBUG:
+    # Имена с хешем и сжатые копии создаёт collectstatic.
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+# Отдавать static и media из самого приложения (core.files): удобно для
+# нагрузочных тестов без nginx. За веб-сервером можно выключить.
+SERVE_FILES = True
 
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Файлы называются по хешу содержимого, см. core.storage.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentHashStorage'
+
+# Сессия и пользователь читаются из кеша, база нужна только при промахе.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Движок ленты подписок: 'join' — один JOIN по Follow,
+# 'merge' — слияние кешированных последних постов авторов.
+FOLLOW_FEED_ENGINE = 'join'
+
+# Словарь, IDF и векторы постов для инкрементального build_related_posts.
+RELATED_POSTS_INDEX = os.path.join(BASE_DIR, 'related_posts.npz')
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -116,5 +163,8 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # По умолчанию LocMemCache держит 300 ключей и при переполнении
+        # выбрасывает треть, теряя буферы счётчиков.
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# core.warmup импортирует модели, поэтому после django.setup().
+from core.warmup import WarmupOnFirstRequest  # noqa: E402
+
+application = WarmupOnFirstRequest(application)